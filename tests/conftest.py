@@ -0,0 +1,18 @@
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--parallel-bench",
+        action="store_true",
+        default=False,
+        help="Run the implementations in each performance test concurrently. "
+        "Shortens wall time, but they share bandwidth, so durations are not "
+        "comparable.",
+    )
+
+
+@pytest.fixture
+def parallel_bench(request) -> bool:
+    """Whether performance tests should run their implementations concurrently."""
+    return request.config.getoption("--parallel-bench")
@@ -0,0 +1,177 @@
+"""Helpers shared by the performance benchmarks."""
+
+import csv
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa_csv = None
+
+# Download into RAM-backed tmpfs where available so the benchmarks measure
+# network and client overhead rather than local disk writes.
+# ROBINZHON_BENCH_TMPDIR overrides the location.
+TMP_BASE_DIR = os.environ.get("ROBINZHON_BENCH_TMPDIR") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") else None
+)
+
+
+def scan_dir_sizes(directory: str) -> Dict[str, int]:
+    """Map each regular file in directory to its size with one scandir pass."""
+    try:
+        with os.scandir(directory) as entries:
+            return {
+                entry.name: entry.stat(follow_symlinks=False).st_size
+                for entry in entries
+                if entry.is_file(follow_symlinks=False)
+            }
+    except OSError:
+        return {}
+
+
+class PerformanceMetrics:
+    """Simple class to capture and display performance metrics."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start_time = None
+        self.end_time = None
+        self.duration = None
+        self.results = None
+        self.verification_data = None
+        self._total = 0
+        self._successful_count = 0
+        self._actual_files_count = 0
+        self._estimated_files_count = None
+        self._success_rate = 0.0
+        self._strict_success_rate = 0.0
+
+    def start(self):
+        self.start_time = time.perf_counter_ns()
+
+    def end(self, results):
+        self.end_time = time.perf_counter_ns()
+        self.duration = (self.end_time - self.start_time) / 1e9
+        self.results = results
+
+        # Resolve the result type once so the accessors are plain reads.
+        if isinstance(results, dict):
+            self._total = results.get("total", 0)
+            self._successful_count = len(results.get("successful", []))
+            self._success_rate = results.get("success_rate", 0) * 100
+            strict_rate = results.get("strict_success_rate")
+            actual_count = results.get("actual_files_count")
+        else:
+            self._total = results.total_count()
+            self._successful_count = len(results.successful)
+            self._success_rate = results.success_rate() * 100
+            strict_rate = None
+            actual_count = None
+
+        if strict_rate is not None:
+            self._strict_success_rate = strict_rate * 100
+        else:
+            self._strict_success_rate = self._success_rate
+        if actual_count is not None:
+            self._actual_files_count = actual_count
+        else:
+            self._actual_files_count = self._successful_count
+
+    def set_verification_data(
+        self,
+        actual_count: Optional[int],
+        strict_rate: float,
+        estimated_count: Optional[int] = None,
+    ):
+        """
+        Set verification data calculated outside of timing.
+
+        A sampled verification has no exact count: pass actual_count as None
+        and the sample's extrapolation as estimated_count.
+        """
+        self.verification_data = {
+            "actual_files_count": actual_count,
+            "estimated_files_count": estimated_count,
+            "strict_success_rate": strict_rate,
+        }
+        self._actual_files_count = actual_count
+        self._estimated_files_count = estimated_count
+        self._strict_success_rate = strict_rate * 100
+
+    def throughput(self) -> float:
+        """Files per second."""
+        return self._total / self.duration if self.duration else 0
+
+    def success_rate(self) -> float:
+        """Success rate as percentage."""
+        return self._success_rate
+
+    def strict_success_rate(self) -> float:
+        """Strict success rate as percentage (based on actual file counts)."""
+        return self._strict_success_rate
+
+    def successful_count(self) -> int:
+        """Number of successful downloads."""
+        return self._successful_count
+
+    def actual_files_count(self) -> Optional[int]:
+        """Number of files that actually exist on disk, or None if only a sample was checked."""
+        return self._actual_files_count
+
+    def estimated_files_count(self) -> Optional[int]:
+        """Files on disk extrapolated from a sampled verification, if one was run."""
+        return self._estimated_files_count
+
+    def as_dict(self) -> dict:
+        """Every reported figure, keyed for the JSON report."""
+        return {
+            "duration": self.duration,
+            "throughput": self.throughput(),
+            "success_rate": self._success_rate,
+            "strict_success_rate": self._strict_success_rate,
+            "successful_count": self._successful_count,
+            "actual_files_count": self._actual_files_count,
+            "estimated_files_count": self._estimated_files_count,
+        }
+
+
+@lru_cache(maxsize=4)
+def _load_all(csv_file: str) -> Tuple[Tuple[str, str], ...]:
+    """Load every (bucket, key) pair from the CSV file, parsed once per process."""
+    csv_path = Path(__file__).parent / csv_file
+    if not csv_path.exists():
+        return ()
+
+    if pa_csv is not None:
+        columns = ["BUCKET_NAME", "IMAGE_PATH"]
+        table = pa_csv.read_csv(
+            csv_path,
+            read_options=pa_csv.ReadOptions(block_size=1 << 20),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns,
+                column_types={column: pa.string() for column in columns},
+            ),
+        )
+        return tuple(
+            zip(
+                table.column("BUCKET_NAME").to_pylist(),
+                table.column("IMAGE_PATH").to_pylist(),
+            )
+        )
+
+    with open(csv_path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        bucket_index = header.index("BUCKET_NAME")
+        key_index = header.index("IMAGE_PATH")
+        return tuple((row[bucket_index], row[key_index]) for row in reader)
+
+
+def load_test_data(csv_file: str, limit: int = 50) -> List[Tuple[str, str]]:
+    """Load test data from CSV file, limiting to first N entries for manageable testing."""
+    return list(_load_all(csv_file)[:limit])
@@ -1,315 +1,858 @@
-import csv
+import io
+import json
 import os
+import queue
+import random
+import stat
+import subprocess
+import sys
 import tempfile
-import time
 import asyncio
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextlib
+import math
+import multiprocessing
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 from pathlib import Path
-from typing import List, Tuple
-
-import aioboto3
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import aiofiles
 import boto3
 import pytest
 import robinzhon
-from boto3.s3.transfer import S3Transfer
+
+from _bench_utils import (
+    TMP_BASE_DIR,
+    PerformanceMetrics,
+    load_test_data,
+    scan_dir_sizes,
+)
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Upper bound on keys fetched back-to-back by one worker over its pooled
+# connection before handing control back to the executor.
+BATCH_SIZE = 64
+
+# Objects larger than this are fetched as concurrent byte-range parts.
+PART_SIZE = 8 * 1024 * 1024
+# Parallel range reads per host plateau around 16.
+MAX_PART_WORKERS = 16
+# Bytes handed to each pwrite(2) when streaming a response body to disk.
+WRITE_CHUNK_SIZE = 1 << 20
+
+# Files stat'ed by verify_downloads unless full=True.
+VERIFY_SAMPLE_SIZE = 32
+
+# Every benchmark run appends one JSON line here for regression tracking.
+BENCH_RESULTS_FILE = Path(__file__).parent / "bench_results.jsonl"
+
+
+def _client_config() -> Config:
+    """botocore client config for the threaded and process-pool baselines."""
+    # Each download worker owns its client, so at most that worker's own GET
+    # plus every range-part thread can share one client's pool at a time.
+    # Size the pool to exactly that so no request waits for a socket or
+    # opens a throwaway one. Pin virtual-hosted addressing so every request
+    # reuses connections to the same bucket endpoint. Checksums are only
+    # computed when an operation requires them, so the baseline does not
+    # hash every response body in Python.
+    return Config(
+        max_pool_connections=MAX_PART_WORKERS + 1,
+        tcp_keepalive=True,
+        retries={"max_attempts": 3, "mode": "adaptive"},
+        s3={
+            "addressing_style": "virtual",
+            "use_accelerate_endpoint": False,
+        },
+        request_checksum_calculation="when_required",
+        response_checksum_validation="when_required",
+    )
+
+
+# Built once per worker process by _init_process_worker.
+_process_s3_client = None
+_process_part_executor = None
+
+
+def _init_process_worker(region_name: str) -> None:
+    """ProcessPoolExecutor initializer: build this process's boto3 client and range-part executor."""
+    global _process_s3_client, _process_part_executor
+    _process_s3_client = boto3.client(
+        "s3", region_name=region_name, config=_client_config()
+    )
+    _process_part_executor = ThreadPoolExecutor(max_workers=MAX_PART_WORKERS)
+
+
+def _process_warm_up(bucket_name: str) -> None:
+    """Best-effort HEAD of the bucket from a worker process."""
+    try:
+        _process_s3_client.head_bucket(Bucket=bucket_name)
+    except Exception:
+        pass
+
+
+def _process_download_single(
+    bucket_name: str, object_key: str, local_path: str
+) -> Tuple[bool, str]:
+    """Download one object inside a worker process using that process's own boto3 client."""
+    try:
+        fd = os.open(local_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            _download_object(
+                _process_s3_client,
+                bucket_name,
+                object_key,
+                fd,
+                _process_part_executor,
+            )
+        finally:
+            os.close(fd)
+        return True, local_path
+    except Exception:
+        return False, object_key
+
+
+def _process_download_batch(
+    bucket_name: str, batch: List[Tuple[str, str]]
+) -> List[Tuple[bool, str]]:
+    """Download a batch of (key, path) pairs inside one worker process."""
+    return [
+        _process_download_single(bucket_name, object_key, local_path)
+        for object_key, local_path in batch
+    ]
 
 
 class AsyncAioboto3Downloader:
-    """Async implementation using aioboto3 for comparison."""
+    """Async implementation using aiobotocore (the client layer under aioboto3) for comparison."""
 
     def __init__(self, region_name: str, max_concurrent: int = 8):
         self.region_name = region_name
         self.max_concurrent = max_concurrent
+        # aiohttp's connector limit follows max_pool_connections, so the pool
+        # matches the number of in-flight downloads. As in _client_config,
+        # checksums are only handled when an operation requires them.
+        self.config = AioConfig(
+            max_pool_connections=max_concurrent,
+            connector_args={"ttl_dns_cache": 300, "keepalive_timeout": 60},
+            request_checksum_calculation="when_required",
+            response_checksum_validation="when_required",
+        )
+        self._client_context = None
+        self._s3_client = None
+
+    async def __aenter__(self) -> "AsyncAioboto3Downloader":
+        """Open one client that warm_up and downloads share until exit."""
+        self._client_context = get_session().create_client(
+            "s3", region_name=self.region_name, config=self.config
+        )
+        self._s3_client = await self._client_context.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        client_context = self._client_context
+        self._client_context = None
+        self._s3_client = None
+        await client_context.__aexit__(*exc_info)
+
+    @contextlib.asynccontextmanager
+    async def _client(self):
+        """Yield the client opened by __aenter__, or a client for this call only."""
+        if self._s3_client is not None:
+            yield self._s3_client
+            return
+        async with get_session().create_client(
+            "s3", region_name=self.region_name, config=self.config
+        ) as s3_client:
+            yield s3_client
 
     async def download_multiple_files_with_paths(
-        self, bucket_name: str, downloads: List[Tuple[str, str]]
+        self,
+        bucket_name: str,
+        downloads: List[Tuple[str, str]],
+        base_dir: Optional[str] = None,
     ) -> dict:
-        """Download multiple files using aioboto3 with asyncio semaphore."""
+        """Download multiple files using one shared aiobotocore client and max_concurrent queue workers."""
         successful = []
         failed = []
-        all_target_paths = [local_path for _, local_path in downloads]
+        total = len(downloads)
 
-        semaphore = asyncio.Semaphore(self.max_concurrent)
+        _make_parent_dirs(downloads, base_dir)
+
+        pending = asyncio.Queue()
+        for download in downloads:
+            pending.put_nowait(download)
+        # Caps range parts in flight across all workers, like the shared part
+        # executor in ThreadedBoto3Downloader.
+        part_slots = asyncio.Semaphore(MAX_PART_WORKERS)
 
         async def download_single(
             s3_client, object_key: str, local_path: str
         ) -> Tuple[bool, str]:
-            async with semaphore:
-                try:
-                    os.makedirs(os.path.dirname(local_path), exist_ok=True)
-
-                    await s3_client.download_file(
-                        bucket_name, object_key, local_path
-                    )
-                    return True, local_path
-                except Exception:
-                    return False, object_key
-
-        session = aioboto3.Session()
-
-        async with session.client("s3") as s3_client:
-            tasks = []
-
-            for obj_key, local_path in downloads:
-                task = download_single(s3_client, obj_key, local_path)
-                tasks.append(task)
+            try:
+                await _download_object_async(
+                    s3_client, bucket_name, object_key, local_path, part_slots
+                )
+                return True, local_path
+            except Exception:
+                return False, object_key
 
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        async def worker(s3_client) -> None:
+            # Every download is queued up front, so an empty pending means done.
+            while True:
+                try:
+                    obj_key, local_path = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                # Workers share one event loop thread, so appending needs no
+                # lock.
+                success, result = await download_single(
+                    s3_client, obj_key, local_path
+                )
+                (successful if success else failed).append(result)
 
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                failed.append(downloads[i][0])
-            else:
-                success, result_value = result
-                if success:
-                    successful.append(result_value)
-                else:
-                    failed.append(result_value)
+        async with self._client() as s3_client:
+            await asyncio.gather(
+                *(
+                    worker(s3_client)
+                    for _ in range(min(self.max_concurrent, total))
+                )
+            )
 
-        actual_files_count = self._count_existing_files(all_target_paths)
-        strict_success_rate = (
-            actual_files_count / len(downloads) if downloads else 0
+        actual_files_count = _count_existing_files(
+            local_path for _, local_path in downloads
         )
+        strict_success_rate = actual_files_count / total if total else 0
 
         return {
             "successful": successful,
             "failed": failed,
-            "total": len(downloads),
-            "success_rate": len(successful) / len(downloads)
-            if downloads
-            else 0,
+            "total": total,
+            "success_rate": len(successful) / total if total else 0,
             "strict_success_rate": strict_success_rate,
             "actual_files_count": actual_files_count,
         }
 
-    def _count_existing_files(self, file_paths: List[str]) -> int:
-        """Count how many files actually exist on disk with non-zero size."""
-        return sum(
-            1
-            for path in file_paths
-            if os.path.isfile(path) and os.path.getsize(path) > 0
-        )
+    async def warm_up(self, bucket_name: str) -> None:
+        """
+        Best-effort HEAD of the bucket so DNS and credentials are resolved before timing.
+
+        Call it inside ``async with downloader`` so the timed run reuses the
+        connection it opens.
+        """
+        try:
+            async with self._client() as s3_client:
+                await s3_client.head_bucket(Bucket=bucket_name)
+        except Exception:
+            pass
 
 
 class ThreadedBoto3Downloader:
-    """Threaded implementation using boto3 S3Transfer with ThreadPoolExecutor for comparison."""
+    """Threaded implementation using boto3 with ThreadPoolExecutor for comparison."""
 
     def __init__(self, region_name: str, max_workers: int = 8):
         self.region_name = region_name
         self.max_workers = max_workers
-        self.s3_client = boto3.client("s3", region_name=region_name)
-        self.transfer = S3Transfer(self.s3_client)
+        # One client per worker thread, built here so client creation stays
+        # out of the timed run. Sessions are not thread-safe, so each client
+        # comes from a session of its own; each batch borrows one from the
+        # queue and hands it back when done.
+        self._worker_clients = []
+        self._idle_clients = queue.SimpleQueue()
+        for _ in range(max_workers):
+            client = boto3.session.Session().client(
+                "s3",
+                region_name=region_name,
+                config=_client_config(),
+            )
+            self._worker_clients.append(client)
+            self._idle_clients.put(client)
 
     def download_multiple_files_with_paths(
-        self, bucket_name: str, downloads: List[Tuple[str, str]]
+        self,
+        bucket_name: str,
+        downloads: List[Tuple[str, str]],
+        base_dir: Optional[str] = None,
     ) -> dict:
         """Download multiple files using ThreadPoolExecutor for concurrent downloads."""
         successful = []
         failed = []
+        total = len(downloads)
+
+        _make_parent_dirs(downloads, base_dir)
 
         def download_single(
-            object_key: str, local_path: str
+            s3_client, object_key: str, local_path: str
         ) -> Tuple[bool, str]:
+            # Each worker holds at most one destination open at a time, so
+            # large runs stay well under RLIMIT_NOFILE.
             try:
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
-
-                self.transfer.download_file(bucket_name, object_key, local_path)
+                fd = os.open(
+                    local_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644
+                )
+            except OSError:
+                return False, object_key
+            try:
+                _download_object(
+                    s3_client,
+                    bucket_name,
+                    object_key,
+                    fd,
+                    part_executor,
+                )
                 return True, local_path
             except Exception:
                 return False, object_key
+            finally:
+                os.close(fd)
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_download = {
-                executor.submit(download_single, obj_key, local_path): (
-                    obj_key,
-                    local_path,
-                )
-                for obj_key, local_path in downloads
-            }
-
-            for future in as_completed(future_to_download):
-                obj_key, local_path = future_to_download[future]
-                try:
-                    success, result = future.result()
-                    if success:
-                        successful.append(result)
-                    else:
-                        failed.append(result)
-                except Exception:
-                    failed.append(obj_key)
+        def download_batch(
+            batch: List[Tuple[str, str]],
+        ) -> List[Tuple[bool, str]]:
+            s3_client = self._idle_clients.get()
+            try:
+                return [
+                    download_single(s3_client, obj_key, local_path)
+                    for obj_key, local_path in batch
+                ]
+            finally:
+                self._idle_clients.put(s3_client)
+
+        # Keep every worker busy on small runs while capping batches at
+        # BATCH_SIZE on large ones.
+        batch_size = max(1, min(BATCH_SIZE, -(-total // self.max_workers)))
+        batches = [
+            downloads[i : i + batch_size]
+            for i in range(0, len(downloads), batch_size)
+        ]
+
+        with (
+            ThreadPoolExecutor(max_workers=self.max_workers) as executor,
+            ThreadPoolExecutor(max_workers=MAX_PART_WORKERS) as part_executor,
+        ):
+            for batch_results in executor.map(download_batch, batches):
+                for success, result in batch_results:
+                    (successful if success else failed).append(result)
 
         return {
             "successful": successful,
             "failed": failed,
-            "total": len(downloads),
-            "success_rate": len(successful) / len(downloads)
-            if downloads
-            else 0,
+            "total": total,
+            "success_rate": len(successful) / total if total else 0,
         }
 
-    def verify_downloads(
-        self, results: dict, all_target_paths: List[str]
+    def warm_up(self, bucket_name: str) -> None:
+        """Best-effort HEAD of the bucket through every worker client so each has a live connection before timing."""
+
+        def head_bucket(s3_client) -> None:
+            try:
+                s3_client.head_bucket(Bucket=bucket_name)
+            except Exception:
+                pass
+
+        with ThreadPoolExecutor(
+            max_workers=len(self._worker_clients)
+        ) as executor:
+            list(executor.map(head_bucket, self._worker_clients))
+
+
+class ProcessBoto3Downloader:
+    """Process-pool implementation using boto3, with one client per worker process, for comparison."""
+
+    def __init__(self, region_name: str, max_workers: int = 8):
+        self.region_name = region_name
+        self.max_workers = max_workers
+        # The pool lives as long as the downloader, so process start-up and
+        # each worker's client stay out of the timed run. Workers are spawned
+        # rather than forked: the pool starts them lazily, possibly while
+        # other benchmarks' threads hold botocore or urllib3 locks.
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process_worker,
+            initargs=(region_name,),
+        )
+
+    def download_multiple_files_with_paths(
+        self,
+        bucket_name: str,
+        downloads: List[Tuple[str, str]],
+        base_dir: Optional[str] = None,
     ) -> dict:
-        """Verify downloaded files exist and have non-zero size. Run this outside of timing."""
-        actual_files_count = self._count_existing_files(all_target_paths)
-        strict_success_rate = (
-            actual_files_count / results["total"] if results["total"] else 0
+        """Download multiple files across worker processes, each with its own boto3 client and GIL."""
+        successful = []
+        failed = []
+        total = len(downloads)
+
+        _make_parent_dirs(downloads, base_dir)
+
+        # Batches amortize the per-task pickling round trip, capped at
+        # BATCH_SIZE as for the threaded workers.
+        batch_size = max(1, min(BATCH_SIZE, -(-total // self.max_workers)))
+        futures = [
+            self._pool.submit(
+                _process_download_batch,
+                bucket_name,
+                downloads[i : i + batch_size],
+            )
+            for i in range(0, total, batch_size)
+        ]
+        for future in futures:
+            for success, result in future.result():
+                (successful if success else failed).append(result)
+
+        return {
+            "successful": successful,
+            "failed": failed,
+            "total": total,
+            "success_rate": len(successful) / total if total else 0,
+        }
+
+    def warm_up(self, bucket_name: str) -> None:
+        """Start every worker process and send a best-effort HEAD of the bucket from each before timing."""
+        # Submitting one task per worker before any completes makes the pool
+        # start all of its processes now rather than mid-run.
+        futures = [
+            self._pool.submit(_process_warm_up, bucket_name)
+            for _ in range(self.max_workers)
+        ]
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        self._pool.shutdown()
+
+
+def _download_object(
+    s3_client,
+    bucket_name: str,
+    object_key: str,
+    fd: int,
+    part_executor: ThreadPoolExecutor,
+) -> None:
+    """Download one object into fd, fetching anything past the first PART_SIZE bytes as concurrent ranges."""
+    try:
+        response = s3_client.get_object(
+            Bucket=bucket_name,
+            Key=object_key,
+            Range=f"bytes=0-{PART_SIZE - 1}",
         )
+    except ClientError as e:
+        # Empty objects cannot satisfy any byte range.
+        if e.response["Error"]["Code"] != "InvalidRange":
+            raise
+        response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+
+    content_range = response.get("ContentRange")
+    size = int(content_range.rsplit("/", 1)[1]) if content_range else 0
+
+    def download_part(offset: int) -> None:
+        last_byte = min(offset + PART_SIZE, size) - 1
+        part = s3_client.get_object(
+            Bucket=bucket_name,
+            Key=object_key,
+            Range=f"bytes={offset}-{last_byte}",
+        )
+        _write_stream(fd, part["Body"], offset)
 
-        results["strict_success_rate"] = strict_success_rate
+    if size > PART_SIZE:
+        os.ftruncate(fd, size)
+    _write_stream(fd, response["Body"], 0)
+    list(part_executor.map(download_part, range(PART_SIZE, size, PART_SIZE)))
+    _drop_page_cache(fd)
+
+
+def verify_downloads(
+    results: dict,
+    base_dir: str,
+    expected_names: Iterable[str],
+    full: bool = False,
+) -> dict:
+    """
+    Verify downloaded files exist and have non-zero size. Run this outside of timing.
+
+    Unless full is set, only a random sample of VERIFY_SAMPLE_SIZE files is
+    checked: the strict success rate is estimated from it, the implied file
+    count is stored as estimated_files_count, and strict_success_margin
+    holds the estimate's 95% Hoeffding error bound. A full check stores the
+    exact actual_files_count instead.
+    """
+    expected_names = list(expected_names)
+    if full or len(expected_names) <= VERIFY_SAMPLE_SIZE:
+        actual_files_count = _count_existing_files_in_dir(
+            base_dir, expected_names
+        )
         results["actual_files_count"] = actual_files_count
-        return results
-
-    def _count_existing_files(self, file_paths: List[str]) -> int:
-        """Count how many files actually exist on disk with non-zero size."""
-        return sum(
-            1
-            for path in file_paths
-            if os.path.isfile(path) and os.path.getsize(path) > 0
+        results["strict_success_rate"] = (
+            actual_files_count / results["total"] if results["total"] else 0
+        )
+        results["strict_success_margin"] = 0.0
+    else:
+        sample = random.sample(expected_names, VERIFY_SAMPLE_SIZE)
+        hits = _count_existing_files(
+            os.path.join(base_dir, name) for name in sample
+        )
+        strict_success_rate = hits / len(sample)
+        results["estimated_files_count"] = round(
+            strict_success_rate * results["total"]
         )
+        results["strict_success_rate"] = strict_success_rate
+        results["strict_success_margin"] = math.sqrt(
+            math.log(2 / 0.05) / (2 * len(sample))
+        )
+    return results
 
 
-class PerformanceMetrics:
-    """Simple class to capture and display performance metrics."""
+def record_verification(
+    metrics: PerformanceMetrics,
+    results: dict,
+    downloads: List[Tuple[str, str]],
+    base_dir: str,
+) -> None:
+    """Verify a baseline's downloads after timing and attach the outcome to its metrics."""
+    print("Verifying downloads...")
+    expected_names = [os.path.basename(path) for _, path in downloads]
+    verify_downloads(results, base_dir, expected_names)
+    metrics.set_verification_data(
+        results.get("actual_files_count"),
+        results["strict_success_rate"],
+        estimated_count=results.get("estimated_files_count"),
+    )
+
+
+def _count_existing_files(file_paths: Iterable[str]) -> int:
+    """Count how many files actually exist on disk with non-zero size."""
+    count = 0
+    for path in file_paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+            count += 1
+    return count
 
-    def __init__(self, name: str):
-        self.name = name
-        self.start_time = None
-        self.end_time = None
-        self.duration = None
-        self.results = None
-        self.verification_data = None
 
-    def start(self):
-        self.start_time = time.time()
+def _count_existing_files_in_dir(
+    base_dir: str, expected_names: Iterable[str]
+) -> int:
+    """Count expected files in base_dir with non-zero size using a single directory scan."""
+    sizes = scan_dir_sizes(base_dir)
+    return sum(1 for name in expected_names if sizes.get(name, 0) > 0)
 
-    def end(self, results):
-        self.end_time = time.time()
-        self.duration = self.end_time - self.start_time
-        self.results = results
 
-    def set_verification_data(self, actual_count: int, strict_rate: float):
-        """Set verification data calculated outside of timing."""
-        self.verification_data = {
-            "actual_files_count": actual_count,
-            "strict_success_rate": strict_rate,
-        }
+def _make_parent_dirs(
+    downloads: List[Tuple[str, str]], base_dir: Optional[str]
+) -> None:
+    """Create every destination directory once, or only base_dir when the caller says all paths share it."""
+    if base_dir is not None:
+        os.makedirs(base_dir, exist_ok=True)
+        return
+    for directory in {os.path.dirname(p) for _, p in downloads}:
+        os.makedirs(directory, exist_ok=True)
 
-    def throughput(self) -> float:
-        """Files per second."""
-        if self.duration and self.results:
-            total_files = getattr(
-                self.results,
-                "total_count",
-                lambda: self.results.get("total", 0),
-            )()
-            return total_files / self.duration
-        return 0
-
-    def success_rate(self) -> float:
-        """Success rate as percentage."""
-        if hasattr(self.results, "success_rate"):
-            return self.results.success_rate() * 100
-        elif isinstance(self.results, dict):
-            return self.results.get("success_rate", 0) * 100
-        return 0
-
-    def strict_success_rate(self) -> float:
-        """Strict success rate as percentage (based on actual file counts)."""
-        if self.verification_data:
-            return self.verification_data["strict_success_rate"] * 100
-        elif (
-            isinstance(self.results, dict)
-            and "strict_success_rate" in self.results
-        ):
-            return self.results.get("strict_success_rate", 0) * 100
-        return self.success_rate()
-
-    def successful_count(self) -> int:
-        """Number of successful downloads."""
-        if hasattr(self.results, "successful"):
-            return len(self.results.successful)
-        elif isinstance(self.results, dict):
-            return len(self.results.get("successful", []))
-        return 0
-
-    def actual_files_count(self) -> int:
-        """Number of files that actually exist on disk."""
-        if self.verification_data:
-            return self.verification_data["actual_files_count"]
-        elif (
-            isinstance(self.results, dict)
-            and "actual_files_count" in self.results
-        ):
-            return self.results.get("actual_files_count", 0)
-        return self.successful_count()
 
+async def _download_object_async(
+    s3_client,
+    bucket_name: str,
+    object_key: str,
+    local_path: str,
+    part_slots: asyncio.Semaphore,
+) -> None:
+    """Async counterpart of _download_object, gathering the extra ranges under part_slots and writing through aiofiles."""
+    try:
+        response = await s3_client.get_object(
+            Bucket=bucket_name,
+            Key=object_key,
+            Range=f"bytes=0-{PART_SIZE - 1}",
+        )
+    except ClientError as e:
+        # Empty objects cannot satisfy any byte range.
+        if e.response["Error"]["Code"] != "InvalidRange":
+            raise
+        response = await s3_client.get_object(
+            Bucket=bucket_name, Key=object_key
+        )
+
+    content_range = response.get("ContentRange")
+    size = int(content_range.rsplit("/", 1)[1]) if content_range else 0
+
+    async def download_part(offset: int) -> None:
+        last_byte = min(offset + PART_SIZE, size) - 1
+        async with part_slots:
+            part = await s3_client.get_object(
+                Bucket=bucket_name,
+                Key=object_key,
+                Range=f"bytes={offset}-{last_byte}",
+            )
+            async with aiofiles.open(local_path, "r+b") as f:
+                await f.seek(offset)
+                async for chunk in part["Body"].iter_chunks(WRITE_CHUNK_SIZE):
+                    await f.write(chunk)
 
-def load_test_data(csv_file: str, limit: int = 50) -> List[Tuple[str, str]]:
-    """Load test data from CSV file, limiting to first N entries for manageable testing."""
-    downloads = []
-    csv_path = Path(__file__).parent / csv_file
+    async with aiofiles.open(local_path, "wb") as f:
+        if size > PART_SIZE:
+            await f.truncate(size)
+        async for chunk in response["Body"].iter_chunks(WRITE_CHUNK_SIZE):
+            await f.write(chunk)
+    await asyncio.gather(
+        *(download_part(offset) for offset in range(PART_SIZE, size, PART_SIZE))
+    )
 
-    with open(csv_path, "r") as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader):
-            if i >= limit:
-                break
-            bucket_name = row["BUCKET_NAME"]
-            object_key = row["IMAGE_PATH"]
-            downloads.append((bucket_name, object_key))
 
-    return downloads
+def _write_stream(fd: int, body, offset: int) -> None:
+    """Write a streaming response body to fd starting at offset, bypassing Python's buffered file layer."""
+    for chunk in iter(lambda: body.read(WRITE_CHUNK_SIZE), b""):
+        offset += os.pwrite(fd, chunk, offset)
+
+
+def _drop_page_cache(fd: int) -> None:
+    """Start writeback and tell the kernel not to keep a write-once file cached."""
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
 
 
 def create_download_paths(
     downloads: List[Tuple[str, str]], base_dir: str
 ) -> List[Tuple[str, str]]:
     """Create local file paths for downloads."""
+    sep = os.sep
     return [
-        (object_key, os.path.join(base_dir, f"file_{i:03d}.jpg"))
-        for i, (bucket_name, object_key) in enumerate(downloads)
+        (downloads[i][1], f"{base_dir}{sep}file_{i:03d}.jpg")
+        for i in range(len(downloads))
     ]
 
 
 def print_summary(
-    duration_winner: str,
-    threaded_metrics: PerformanceMetrics,
-    async_metrics: PerformanceMetrics,
-    rust_metrics: PerformanceMetrics,
+    duration_winner: str, metrics: Dict[str, PerformanceMetrics]
 ) -> None:
     print("\nPerformance Summary:")
+    rust_metrics = metrics["robinzhon"]
+    others = {
+        name: other for name, other in metrics.items() if name != "robinzhon"
+    }
     if duration_winner == "robinzhon":
-        vs_threaded_speedup = threaded_metrics.duration / rust_metrics.duration
-        vs_async_speedup = async_metrics.duration / rust_metrics.duration
-        print(
-            f"robinzhon is {vs_threaded_speedup:.1f}x faster than threaded boto3"
-        )
-        print(f"robinzhon is {vs_async_speedup:.1f}x faster than aioboto3")
+        for name, other in others.items():
+            speedup = other.duration / rust_metrics.duration
+            print(f"robinzhon is {speedup:.1f}x faster than {name}")
     else:
         print(f"Winner: {duration_winner}")
-        if rust_metrics.duration > threaded_metrics.duration:
-            slowdown_factor = rust_metrics.duration / threaded_metrics.duration
-            print(
-                f"robinzhon is {slowdown_factor:.1f}x slower than threaded boto3"
+        for name, other in others.items():
+            if rust_metrics.duration > other.duration:
+                slowdown_factor = rust_metrics.duration / other.duration
+                print(f"robinzhon is {slowdown_factor:.1f}x slower than {name}")
+
+
+def print_results(
+    file_count: int, metrics: Dict[str, PerformanceMetrics]
+) -> None:
+    """Print one column per implementation, robinzhon first, then the summary."""
+    names = ["robinzhon", *(name for name in metrics if name != "robinzhon")]
+    rule = "=" * (32 + 16 * len(names))
+
+    def print_row(
+        label: str, values: Dict[str, float], spec: str, winner: str = ""
+    ) -> None:
+        cells = "".join(f"{values[name]:<15{spec}} " for name in names)
+        print(f"{label:<25} {cells}{winner}".rstrip())
+
+    print(f"\nPerformance Results ({file_count} files)")
+    print(rule)
+    print(
+        f"{'Metric':<25} "
+        + "".join(f"{name:<15} " for name in names)
+        + "Winner"
+    )
+    print(rule)
+
+    durations = {name: metrics[name].duration for name in names}
+    duration_winner = min(durations, key=durations.get)
+    print_row("Duration (seconds)", durations, ".2f", duration_winner)
+
+    throughputs = {name: metrics[name].throughput() for name in names}
+    throughput_winner = max(throughputs, key=throughputs.get)
+    print_row("Throughput (files/sec)", throughputs, ".1f", throughput_winner)
+
+    success_rates = {name: metrics[name].success_rate() for name in names}
+    success_winner = max(success_rates, key=success_rates.get)
+    print_row("Success Rate (%)", success_rates, ".1f", success_winner)
+
+    files = {name: metrics[name].successful_count() for name in names}
+    print_row("Files Downloaded", files, "")
+
+    print(rule)
+
+    print_summary(duration_winner, metrics)
+
+
+def _emit_report(
+    file_count: int,
+    metrics: Dict[str, PerformanceMetrics],
+    verbose: bool = False,
+) -> None:
+    """Print a run as one JSON line and append it to BENCH_RESULTS_FILE; the table is only printed when verbose."""
+    line = json.dumps(
+        {
+            "file_count": file_count,
+            **{name: result.as_dict() for name, result in metrics.items()},
+        }
+    )
+    print(line)
+    with open(BENCH_RESULTS_FILE, "a") as f:
+        f.write(line + "\n")
+    if verbose:
+        print_results(file_count, metrics)
+
+
+def warm_up_robinzhon(downloader, bucket_name: str, object_key: str) -> None:
+    """Fetch one object untimed so robinzhon's client has a live connection before timing."""
+    # Scratch directory, so the measured directory only holds timed downloads.
+    with tempfile.TemporaryDirectory(
+        prefix="robinzhon_warm_up_", dir=TMP_BASE_DIR
+    ) as warm_dir:
+        try:
+            downloader.download_multiple_files_with_paths(
+                bucket_name,
+                [(object_key, os.path.join(warm_dir, "warm_up.jpg"))],
             )
-        if rust_metrics.duration > async_metrics.duration:
-            slowdown_factor = rust_metrics.duration / async_metrics.duration
-            print(f"robinzhon is {slowdown_factor:.1f}x slower than aioboto3")
+        except Exception:
+            pass
+
+
+def _run_coro(coro):
+    """Run coro on uvloop when it is installed (dev group, not on Windows), else on asyncio's default loop."""
+    if uvloop is not None:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
+
+
+def drop_caches() -> None:
+    """Flush dirty pages and drop the page cache. Best-effort, Linux as root only."""
+    if not sys.platform.startswith("linux") or os.geteuid() != 0:
+        return
+    subprocess.run(["sync"], check=False)
+    try:
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+    except OSError:
+        pass
+
+
+def run_in_random_order(
+    runs: Dict[str, Callable[[], Optional[PerformanceMetrics]]],
+    parallel: bool = False,
+) -> Optional[Dict[str, PerformanceMetrics]]:
+    """
+    Run each benchmark once in a random order and return its metrics by name.
+
+    Whichever implementation runs second inherits warm DNS, TLS sessions and
+    local caches from the first, so the order is shuffled per invocation and
+    the page cache is dropped between runs. Returns None as soon as a run
+    reports failure by returning None.
+
+    With parallel=True every run starts at once on its own thread instead.
+    That shortens wall time, but the runs share bandwidth, so their
+    durations are no longer comparable.
+    """
+    metrics = {}
+    if parallel:
+        with ThreadPoolExecutor(max_workers=len(runs)) as executor:
+            futures = {executor.submit(run): name for name, run in runs.items()}
+            for future in as_completed(futures):
+                result = future.result()
+                if result is None:
+                    return None
+                metrics[futures[future]] = result
+        return metrics
+
+    for name in random.sample(list(runs), len(runs)):
+        result = runs[name]()
+        if result is None:
+            return None
+        metrics[name] = result
+        drop_caches()
+    return metrics
+
+
+# Built once and shared by every test_performance_comparison case; each case
+# still downloads into fresh temp directories.
+@pytest.fixture(scope="session")
+def threaded_downloader() -> ThreadedBoto3Downloader:
+    try:
+        return ThreadedBoto3Downloader("us-east-1", max_workers=20)
+    except Exception as e:
+        pytest.skip(f"Failed to initialize threaded boto3 downloader: {e}")
+
+
+@pytest.fixture(scope="session")
+def process_downloader() -> Iterator[ProcessBoto3Downloader]:
+    try:
+        downloader = ProcessBoto3Downloader("us-east-1", max_workers=20)
+    except Exception as e:
+        pytest.skip(f"Failed to initialize process pool downloader: {e}")
+    yield downloader
+    downloader.close()
+
+
+@pytest.fixture(scope="session")
+def async_downloader() -> AsyncAioboto3Downloader:
+    return AsyncAioboto3Downloader("us-east-1", max_concurrent=20)
+
+
+@pytest.fixture(scope="session")
+def rust_downloader() -> robinzhon.S3Downloader:
+    try:
+        return robinzhon.S3Downloader("us-east-1", 20)
+    except Exception as e:
+        pytest.skip(f"Failed to initialize robinzhon downloader: {e}")
 
 
 @pytest.mark.performance
 @pytest.mark.parametrize("file_count", [100, 500, 1000])
-def test_performance_comparison(file_count):
+def test_performance_comparison(
+    file_count,
+    parallel_bench,
+    pytestconfig,
+    threaded_downloader,
+    process_downloader,
+    async_downloader,
+    rust_downloader,
+):
     """
     Compare performance between robinzhon and both Python implementations.
 
     Compares:
     - robinzhon (Rust-based async implementation)
-    - threaded boto3 (Python with ThreadPoolExecutor + S3Transfer)
-    - aioboto3 (Python async implementation)
-
-    Tests different file counts to see how performance scales.
+    - threaded boto3 (Python with ThreadPoolExecutor + batched get_object)
+    - process boto3 (Python with ProcessPoolExecutor, one client per process)
+    - aioboto3 (Python async implementation on aiobotocore, on uvloop when
+      installed)
+
+    Tests different file counts to see how performance scales. Files are
+    written to /dev/shm when available, so results reflect network and
+    client overhead rather than disk speed. Implementations run in a random
+    order with the page cache dropped in between, or all at once with
+    --parallel-bench. Each one makes an untimed warm-up request first so
+    DNS and credential resolution stay out of its duration.
     """
     print(f"\n{'=' * 60}")
     print(f"Performance Test: {file_count} files")
@@ -320,155 +863,154 @@ def test_performance_comparison(file_count):
         pytest.skip("No test data available")
 
     bucket_name = test_data[0][0]
-    max_workers = 20
 
     with (
-        tempfile.TemporaryDirectory(prefix="robinzhon_test_") as rust_dir,
         tempfile.TemporaryDirectory(
-            prefix="threaded_boto3_test_"
+            prefix="robinzhon_test_", dir=TMP_BASE_DIR
+        ) as rust_dir,
+        tempfile.TemporaryDirectory(
+            prefix="threaded_boto3_test_", dir=TMP_BASE_DIR
         ) as threaded_dir,
-        tempfile.TemporaryDirectory(prefix="aioboto3_test_") as async_dir,
+        tempfile.TemporaryDirectory(
+            prefix="process_boto3_test_", dir=TMP_BASE_DIR
+        ) as process_dir,
+        tempfile.TemporaryDirectory(
+            prefix="aioboto3_test_", dir=TMP_BASE_DIR
+        ) as async_dir,
     ):
         rust_downloads = create_download_paths(test_data, rust_dir)
         threaded_downloads = create_download_paths(test_data, threaded_dir)
+        process_downloads = create_download_paths(test_data, process_dir)
         async_downloads = create_download_paths(test_data, async_dir)
 
-        print("\nTesting threaded boto3 implementation...")
-        threaded_metrics = PerformanceMetrics("threaded boto3")
-        threaded_metrics.start()
+        def run_threaded() -> PerformanceMetrics:
+            print("\nTesting threaded boto3 implementation...")
+            threaded_metrics = PerformanceMetrics("threaded boto3")
+            threaded_downloader.warm_up(bucket_name)
+            threaded_metrics.start()
 
-        try:
-            threaded_downloader = ThreadedBoto3Downloader(
-                "us-east-1", max_workers=20
-            )
-            threaded_results = (
-                threaded_downloader.download_multiple_files_with_paths(
-                    bucket_name, threaded_downloads
+            try:
+                threaded_results = (
+                    threaded_downloader.download_multiple_files_with_paths(
+                        bucket_name, threaded_downloads, base_dir=threaded_dir
+                    )
                 )
-            )
-            threaded_metrics.end(threaded_results)
-            print(f"Completed in {threaded_metrics.duration:.2f}s")
-        except Exception as e:
-            print(f"Failed: {e}")
-            pytest.skip(f"Threaded boto3 test failed: {e}")
-
-        print("\nTesting aioboto3 async implementation...")
-        async_metrics = PerformanceMetrics("aioboto3 async")
-        async_metrics.start()
-
-        try:
-            async_downloader = AsyncAioboto3Downloader(
-                "us-east-1", max_concurrent=20
-            )
-            async_results = asyncio.run(
-                async_downloader.download_multiple_files_with_paths(
-                    bucket_name, async_downloads
+                threaded_metrics.end(threaded_results)
+                print(f"Completed in {threaded_metrics.duration:.2f}s")
+                record_verification(
+                    threaded_metrics,
+                    threaded_results,
+                    threaded_downloads,
+                    threaded_dir,
                 )
-            )
-            async_metrics.end(async_results)
-            print(f"Completed in {async_metrics.duration:.2f}s")
-        except Exception as e:
-            print(f"Failed: {e}")
-            pytest.skip(f"aioboto3 test failed: {e}")
-
-        try:
-            rust_downloader = robinzhon.S3Downloader("us-east-1", max_workers)
-        except Exception as e:
-            pytest.skip(f"Failed to initialize robinzhon downloader: {e}")
+            except Exception as e:
+                print(f"Failed: {e}")
+                pytest.skip(f"Threaded boto3 test failed: {e}")
+            return threaded_metrics
 
-        print("\nTesting robinzhon implementation...")
-        rust_metrics = PerformanceMetrics("robinzhon")
-        rust_metrics.start()
+        def run_process() -> PerformanceMetrics:
+            print("\nTesting process pool boto3 implementation...")
+            process_metrics = PerformanceMetrics("process boto3")
+            process_downloader.warm_up(bucket_name)
+            process_metrics.start()
 
-        try:
-            rust_results = rust_downloader.download_multiple_files_with_paths(
-                bucket_name, rust_downloads
-            )
-            rust_metrics.end(rust_results)
-            print(f"Download completed in {rust_metrics.duration:.2f}s")
-
-            print("Verifying robinzhon downloads...")
-            rust_target_paths = [local_path for _, local_path in rust_downloads]
-            rust_actual_count = threaded_downloader._count_existing_files(
-                rust_target_paths
-            )
-
-            if hasattr(rust_results, "total_count"):
-                total = rust_results.total_count()
-            else:
-                total = len(rust_downloads)
-            rust_strict_rate = rust_actual_count / total if total else 0
-            rust_metrics.set_verification_data(
-                rust_actual_count, rust_strict_rate
-            )
-
-        except Exception as e:
-            print(f"Failed: {e}")
-            pytest.skip(f"robinzhon test failed: {e}")
-
-        print(f"\nPerformance Results ({file_count} files)")
-        print(f"{'=' * 80}")
-        print(
-            f"{'Metric':<25} {'robinzhon':<15} {'threaded boto3':<15} {'aioboto3':<15} {'Winner'}"
-        )
-        print(f"{'=' * 80}")
+            try:
+                process_results = (
+                    process_downloader.download_multiple_files_with_paths(
+                        bucket_name, process_downloads, base_dir=process_dir
+                    )
+                )
+                process_metrics.end(process_results)
+                print(f"Completed in {process_metrics.duration:.2f}s")
+                record_verification(
+                    process_metrics,
+                    process_results,
+                    process_downloads,
+                    process_dir,
+                )
+            except Exception as e:
+                print(f"Failed: {e}")
+                pytest.skip(f"Process pool boto3 test failed: {e}")
+            return process_metrics
+
+        def run_async() -> PerformanceMetrics:
+            print("\nTesting aioboto3 async implementation...")
+            async_metrics = PerformanceMetrics("aioboto3 async")
+
+            async def warm_and_time() -> None:
+                # One loop and one client for both the warm-up and the run.
+                download = async_downloader.download_multiple_files_with_paths
+                async with async_downloader:
+                    await async_downloader.warm_up(bucket_name)
+                    async_metrics.start()
+                    async_results = await download(
+                        bucket_name, async_downloads, base_dir=async_dir
+                    )
+                    async_metrics.end(async_results)
 
-        durations = {
-            "robinzhon": rust_metrics.duration,
-            "threaded boto3": threaded_metrics.duration,
-            "aioboto3": async_metrics.duration,
-        }
-        duration_winner = min(durations, key=durations.get)
+            try:
+                _run_coro(warm_and_time())
+                print(f"Completed in {async_metrics.duration:.2f}s")
+            except Exception as e:
+                print(f"Failed: {e}")
+                pytest.skip(f"aioboto3 test failed: {e}")
+            return async_metrics
+
+        def run_rust() -> PerformanceMetrics:
+            print("\nTesting robinzhon implementation...")
+            rust_metrics = PerformanceMetrics("robinzhon")
+            warm_up_robinzhon(rust_downloader, bucket_name, test_data[0][1])
+            rust_metrics.start()
 
-        print(
-            f"{'Duration (seconds)':<25} {rust_metrics.duration:<15.2f} {threaded_metrics.duration:<15.2f} {async_metrics.duration:<15.2f} {duration_winner}"
-        )
+            try:
+                rust_results = (
+                    rust_downloader.download_multiple_files_with_paths(
+                        bucket_name, rust_downloads
+                    )
+                )
+                rust_metrics.end(rust_results)
+                print(f"Download completed in {rust_metrics.duration:.2f}s")
+
+                print("Verifying robinzhon downloads...")
+                rust_names = [
+                    os.path.basename(local_path)
+                    for _, local_path in rust_downloads
+                ]
+                rust_actual_count = _count_existing_files_in_dir(
+                    rust_dir, rust_names
+                )
 
-        rust_throughput = rust_metrics.throughput()
-        threaded_throughput = threaded_metrics.throughput()
-        async_throughput = async_metrics.throughput()
-        throughputs = {
-            "robinzhon": rust_throughput,
-            "threaded boto3": threaded_throughput,
-            "aioboto3": async_throughput,
-        }
-        throughput_winner = max(throughputs, key=throughputs.get)
+                if hasattr(rust_results, "total_count"):
+                    total = rust_results.total_count()
+                else:
+                    total = len(rust_downloads)
+                rust_strict_rate = rust_actual_count / total if total else 0
+                rust_metrics.set_verification_data(
+                    rust_actual_count, rust_strict_rate
+                )
 
-        print(
-            f"{'Throughput (files/sec)':<25} {rust_throughput:<15.1f} {threaded_throughput:<15.1f} {async_throughput:<15.1f} {throughput_winner}"
-        )
+            except Exception as e:
+                print(f"Failed: {e}")
+                pytest.skip(f"robinzhon test failed: {e}")
+            return rust_metrics
 
-        rust_success = rust_metrics.success_rate()
-        threaded_success = threaded_metrics.success_rate()
-        async_success = async_metrics.success_rate()
-        success_rates = {
-            "robinzhon": rust_success,
-            "threaded boto3": threaded_success,
-            "aioboto3": async_success,
+        runs = {
+            "threaded boto3": run_threaded,
+            "process boto3": run_process,
+            "aioboto3": run_async,
+            "robinzhon": run_rust,
         }
-        success_winner = max(success_rates, key=success_rates.get)
-
-        print(
-            f"{'Success Rate (%)':<25} {rust_success:<15.1f} {threaded_success:<15.1f} {async_success:<15.1f} {success_winner}"
-        )
-
-        rust_files = rust_metrics.successful_count()
-        threaded_files = threaded_metrics.successful_count()
-        async_files = async_metrics.successful_count()
+        metrics = run_in_random_order(runs, parallel=parallel_bench)
 
-        print(
-            f"{'Files Downloaded':<25} {rust_files:<15} {threaded_files:<15} {async_files:<15}"
-        )
-
-        print(f"{'=' * 80}")
-
-        print_summary(
-            duration_winner, threaded_metrics, async_metrics, rust_metrics
+        _emit_report(
+            file_count,
+            {name: metrics[name] for name in runs},
+            verbose=pytestconfig.getoption("verbose") > 0,
         )
 
 
 @pytest.mark.performance
-def test_quick_performance_check():
+def test_quick_performance_check(parallel_bench, pytestconfig):
     """
     Quick performance check with just a few files for development/CI.
 
@@ -487,53 +1029,30 @@ def test_quick_performance_check():
     max_workers = 8
 
     with (
-        tempfile.TemporaryDirectory(prefix="robinzhon_test_") as rust_dir,
         tempfile.TemporaryDirectory(
-            prefix="threaded_boto3_test_"
+            prefix="robinzhon_test_", dir=TMP_BASE_DIR
+        ) as rust_dir,
+        tempfile.TemporaryDirectory(
+            prefix="threaded_boto3_test_", dir=TMP_BASE_DIR
         ) as threaded_dir,
-        tempfile.TemporaryDirectory(prefix="aioboto3_test_") as async_dir,
+        tempfile.TemporaryDirectory(
+            prefix="aioboto3_test_", dir=TMP_BASE_DIR
+        ) as async_dir,
     ):
         rust_downloads = create_download_paths(test_data, rust_dir)
         threaded_downloads = create_download_paths(test_data, threaded_dir)
         async_downloads = create_download_paths(test_data, async_dir)
 
-        print("\nTesting threaded boto3 implementation...")
-        threaded_metrics = PerformanceMetrics("threaded boto3")
-        threaded_metrics.start()
-
         try:
             threaded_downloader = ThreadedBoto3Downloader(
                 "us-east-1", max_workers=20
             )
-            threaded_results = (
-                threaded_downloader.download_multiple_files_with_paths(
-                    bucket_name, threaded_downloads
-                )
-            )
-            threaded_metrics.end(threaded_results)
-            print(f"Completed in {threaded_metrics.duration:.2f}s")
         except Exception as e:
-            print(f"Failed: {e}")
-            return
-
-        print("\nTesting aioboto3 async implementation...")
-        async_metrics = PerformanceMetrics("aioboto3 async")
-        async_metrics.start()
-
-        try:
-            async_downloader = AsyncAioboto3Downloader(
-                "us-east-1", max_concurrent=20
-            )
-            async_results = asyncio.run(
-                async_downloader.download_multiple_files_with_paths(
-                    bucket_name, async_downloads
-                )
-            )
-            async_metrics.end(async_results)
-            print(f"Completed in {async_metrics.duration:.2f}s")
-        except Exception as e:
-            print(f"Failed: {e}")
+            print(f"Failed to initialize threaded boto3 downloader: {e}")
             return
+        async_downloader = AsyncAioboto3Downloader(
+            "us-east-1", max_concurrent=20
+        )
 
         print("\nInitializing robinzhon downloader...")
         try:
@@ -542,97 +1061,169 @@ def test_quick_performance_check():
             print(f"Failed to initialize robinzhon downloader: {e}")
             return
 
-        print("\nTesting robinzhon implementation...")
-        rust_metrics = PerformanceMetrics("robinzhon")
-        rust_metrics.start()
+        def run_threaded() -> Optional[PerformanceMetrics]:
+            print("\nTesting threaded boto3 implementation...")
+            threaded_metrics = PerformanceMetrics("threaded boto3")
+            threaded_downloader.warm_up(bucket_name)
+            threaded_metrics.start()
 
-        try:
-            rust_results = rust_downloader.download_multiple_files_with_paths(
-                bucket_name, rust_downloads
-            )
-            rust_metrics.end(rust_results)
-            print(f"Download completed in {rust_metrics.duration:.2f}s")
-        except Exception as e:
-            print(f"Failed: {e}")
-            return
+            try:
+                threaded_results = (
+                    threaded_downloader.download_multiple_files_with_paths(
+                        bucket_name, threaded_downloads, base_dir=threaded_dir
+                    )
+                )
+                threaded_metrics.end(threaded_results)
+                print(f"Completed in {threaded_metrics.duration:.2f}s")
+                record_verification(
+                    threaded_metrics,
+                    threaded_results,
+                    threaded_downloads,
+                    threaded_dir,
+                )
+            except Exception as e:
+                print(f"Failed: {e}")
+                return None
+            return threaded_metrics
+
+        def run_async() -> Optional[PerformanceMetrics]:
+            print("\nTesting aioboto3 async implementation...")
+            async_metrics = PerformanceMetrics("aioboto3 async")
+
+            async def warm_and_time() -> None:
+                # One loop and one client for both the warm-up and the run.
+                download = async_downloader.download_multiple_files_with_paths
+                async with async_downloader:
+                    await async_downloader.warm_up(bucket_name)
+                    async_metrics.start()
+                    async_results = await download(
+                        bucket_name, async_downloads, base_dir=async_dir
+                    )
+                    async_metrics.end(async_results)
 
-        print("\nPerformance Results (5 files)")
-        print(f"{'=' * 80}")
-        print(
-            f"{'Metric':<25} {'robinzhon':<15} {'threaded boto3':<15} {'aioboto3':<15} {'Winner'}"
-        )
-        print(f"{'=' * 80}")
+            try:
+                _run_coro(warm_and_time())
+                print(f"Completed in {async_metrics.duration:.2f}s")
+            except Exception as e:
+                print(f"Failed: {e}")
+                return None
+            return async_metrics
+
+        def run_rust() -> Optional[PerformanceMetrics]:
+            print("\nTesting robinzhon implementation...")
+            rust_metrics = PerformanceMetrics("robinzhon")
+            warm_up_robinzhon(rust_downloader, bucket_name, test_data[0][1])
+            rust_metrics.start()
 
-        durations = {
-            "robinzhon": rust_metrics.duration,
-            "threaded boto3": threaded_metrics.duration,
-            "aioboto3": async_metrics.duration,
+            try:
+                rust_results = (
+                    rust_downloader.download_multiple_files_with_paths(
+                        bucket_name, rust_downloads
+                    )
+                )
+                rust_metrics.end(rust_results)
+                print(f"Download completed in {rust_metrics.duration:.2f}s")
+            except Exception as e:
+                print(f"Failed: {e}")
+                return None
+            return rust_metrics
+
+        runs = {
+            "threaded boto3": run_threaded,
+            "aioboto3": run_async,
+            "robinzhon": run_rust,
         }
-        duration_winner = min(durations, key=durations.get)
+        metrics = run_in_random_order(runs, parallel=parallel_bench)
+        if metrics is None:
+            return
 
-        print(
-            f"{'Duration (seconds)':<25} {rust_metrics.duration:<15.2f} {threaded_metrics.duration:<15.2f} {async_metrics.duration:<15.2f} {duration_winner}"
+        _emit_report(
+            5,
+            {name: metrics[name] for name in runs},
+            verbose=pytestconfig.getoption("verbose") > 0,
         )
 
-        rust_throughput = rust_metrics.throughput()
-        threaded_throughput = threaded_metrics.throughput()
-        async_throughput = async_metrics.throughput()
-        throughputs = {
-            "robinzhon": rust_throughput,
-            "threaded boto3": threaded_throughput,
-            "aioboto3": async_throughput,
-        }
-        throughput_winner = max(throughputs, key=throughputs.get)
 
-        print(
-            f"{'Throughput (files/sec)':<25} {rust_throughput:<15.1f} {threaded_throughput:<15.1f} {async_throughput:<15.1f} {throughput_winner}"
-        )
+class _StubS3Client:
+    """In-memory stand-in for a boto3 S3 client that serves get_object like S3 does."""
+
+    def __init__(self, objects: Dict[str, bytes]):
+        self.objects = objects
+        self.ranges = []
 
-        rust_success = rust_metrics.success_rate()
-        threaded_success = threaded_metrics.success_rate()
-        async_success = async_metrics.success_rate()
-        success_rates = {
-            "robinzhon": rust_success,
-            "threaded boto3": threaded_success,
-            "aioboto3": async_success,
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None):
+        if Key not in self.objects:
+            raise ClientError(
+                {"Error": {"Code": "NoSuchKey", "Message": "Not Found"}},
+                "GetObject",
+            )
+        data = self.objects[Key]
+        if Range is None:
+            return {"Body": io.BytesIO(data)}
+        self.ranges.append(Range)
+        if not data:
+            raise ClientError(
+                {"Error": {"Code": "InvalidRange", "Message": "Bad Range"}},
+                "GetObject",
+            )
+        first, last = map(int, Range[len("bytes=") :].split("-"))
+        last = min(last, len(data) - 1)
+        return {
+            "Body": io.BytesIO(data[first : last + 1]),
+            "ContentRange": f"bytes {first}-{last}/{len(data)}",
         }
-        success_winner = max(success_rates, key=success_rates.get)
 
-        print(
-            f"{'Success Rate (%)':<25} {rust_success:<15.1f} {threaded_success:<15.1f} {async_success:<15.1f} {success_winner}"
-        )
 
-        rust_files = rust_metrics.successful_count()
-        threaded_files = threaded_metrics.successful_count()
-        async_files = async_metrics.successful_count()
+def _download_stub_object(tmp_path: Path, s3_client: _StubS3Client) -> bytes:
+    """Run _download_object for the key "object" and return the file it wrote."""
+    local_path = tmp_path / "object"
+    fd = os.open(local_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_PART_WORKERS) as executor:
+            _download_object(s3_client, "test-bucket", "object", fd, executor)
+    finally:
+        os.close(fd)
+    return local_path.read_bytes()
 
-        print(
-            f"{'Files Downloaded':<25} {rust_files:<15} {threaded_files:<15} {async_files:<15}"
-        )
 
-        print(f"{'=' * 80}")
+def test_download_object_multipart(tmp_path):
+    """Test that an object spanning several parts is fetched as ranges and reassembled in order."""
 
-        print("\nPerformance Summary:")
-        if duration_winner == "robinzhon":
-            vs_threaded_speedup = (
-                threaded_metrics.duration / rust_metrics.duration
-            )
-            vs_async_speedup = async_metrics.duration / rust_metrics.duration
-            print(
-                f"robinzhon is {vs_threaded_speedup:.1f}x faster than threaded boto3"
-            )
-            print(f"robinzhon is {vs_async_speedup:.1f}x faster than aioboto3")
-        else:
-            print(f"Winner: {duration_winner}")
-            if rust_metrics.duration > threaded_metrics.duration:
-                slowdown_factor = (
-                    rust_metrics.duration / threaded_metrics.duration
-                )
-                print(
-                    f"robinzhon is {slowdown_factor:.1f}x slower than threaded boto3"
-                )
-            if rust_metrics.duration > async_metrics.duration:
-                slowdown_factor = rust_metrics.duration / async_metrics.duration
-                print(
-                    f"robinzhon is {slowdown_factor:.1f}x slower than aioboto3"
-                )
+    data = os.urandom(2 * PART_SIZE + 3)
+    s3_client = _StubS3Client({"object": data})
+
+    assert _download_stub_object(tmp_path, s3_client) == data
+    assert sorted(s3_client.ranges) == sorted(
+        [
+            f"bytes=0-{PART_SIZE - 1}",
+            f"bytes={PART_SIZE}-{2 * PART_SIZE - 1}",
+            f"bytes={2 * PART_SIZE}-{2 * PART_SIZE + 2}",
+        ]
+    )
+
+
+def test_download_object_exactly_part_size(tmp_path):
+    """Test that an object of exactly PART_SIZE bytes needs only the first ranged GET."""
+
+    data = os.urandom(PART_SIZE)
+    s3_client = _StubS3Client({"object": data})
+
+    assert _download_stub_object(tmp_path, s3_client) == data
+    assert s3_client.ranges == [f"bytes=0-{PART_SIZE - 1}"]
+
+
+def test_download_object_empty(tmp_path):
+    """Test that an empty object falls back to a plain GET after InvalidRange."""
+
+    s3_client = _StubS3Client({"object": b""})
+
+    assert _download_stub_object(tmp_path, s3_client) == b""
+
+
+def test_download_object_missing_key(tmp_path):
+    """Test that a missing key surfaces the NoSuchKey ClientError."""
+
+    s3_client = _StubS3Client({})
+
+    with pytest.raises(ClientError):
+        _download_stub_object(tmp_path, s3_client)
@@ -7,6 +7,8 @@ This module provides parametrized tests for comparing:
 
 Key features:
 - Parametrized file counts and worker counts
+- robinzhon max_workers autotuning that stops at the throughput knee
+- A (concurrency, parallelism per file) throughput surface written to CSV
 - Comprehensive performance metrics
 - Easy customization via command line or pytest parameters
 
@@ -19,20 +21,132 @@ Usage:
 
     # Run quick test with pytest
     pytest tests/performance/test_vs_s5cmd.py::test_s5cmd_vs_robinzhon_quick_check -v
+
+    # Download somewhere other than /dev/shm
+    ROBINZHON_BENCH_TMPDIR=/mnt/scratch pytest tests/performance/test_vs_s5cmd.py -v
 """
 
 import csv
+import inspect
 import os
+import random
+import stat
 import subprocess
 import tempfile
-import time
+import threading
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 import pytest
 import robinzhon
 
+from _bench_utils import (
+    TMP_BASE_DIR,
+    PerformanceMetrics,
+    load_test_data,
+    scan_dir_sizes,
+)
+
+# os.stat releases the GIL, so verification overlaps stat latency across this
+# many threads, which matters when the targets live on a slow or network FS.
+STAT_WORKERS = 16
+
+# Seconds before a running s5cmd batch is killed.
+S5CMD_TIMEOUT = 300
+
+# Environment passed to s5cmd: AWS configuration, its own endpoint override
+# (used for MinIO/LocalStack runs) plus what it needs to find ~/.aws, proxies
+# and CA certificates. On Windows, Go binaries need SYSTEMROOT to initialize
+# sockets and DNS, and USERPROFILE locates ~/.aws. Everything else is dropped
+# to keep the child's environment small.
+S5CMD_ENV_NAMES = {
+    "PATH",
+    "HOME",
+    "SYSTEMROOT",
+    "USERPROFILE",
+    "S3_ENDPOINT_URL",
+    "HTTP_PROXY",
+    "HTTPS_PROXY",
+    "NO_PROXY",
+    "http_proxy",
+    "https_proxy",
+    "no_proxy",
+    "SSL_CERT_FILE",
+    "SSL_CERT_DIR",
+}
+
+# test_concurrency_parallelism_surface appends one row per case here.
+SURFACE_CSV = Path(__file__).parent / "throughput_surface.csv"
+
+# (file_count, max_workers) matrix shared by the parametrized comparison and
+# test_sweep_inline, which writes its results here.
+SWEEP_CASES = [
+    (10, 8),
+    (50, 16),
+    (100, 20),
+    (200, 32),
+    (500, 40),
+    (1000, 50),
+]
+SWEEP_CSV = Path(__file__).parent / "sweep_results.csv"
+
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    """Return os.stat(path), or None if it cannot be stat'ed."""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _stat_all(paths: Iterable[str]) -> List[Optional[os.stat_result]]:
+    """Stat every path concurrently, in order, with None for missing paths."""
+    with ThreadPoolExecutor(max_workers=STAT_WORKERS) as executor:
+        return list(executor.map(_stat_or_none, paths))
+
+
+def _is_nonempty_file(st: Optional[os.stat_result]) -> bool:
+    """Whether a stat result describes a regular file with content."""
+    return st is not None and stat.S_ISREG(st.st_mode) and st.st_size > 0
+
+
+def _file_sizes(paths: List[str]) -> List[int]:
+    """Size of each path, in order, or 0 if it is missing or not a regular file."""
+    parents = {os.path.dirname(p) for p in paths}
+    if len(parents) == 1:
+        # create_download_paths puts every target in one directory, so one
+        # scandir pass replaces a stat per path.
+        sizes = scan_dir_sizes(parents.pop())
+        return [sizes.get(os.path.basename(p), 0) for p in paths]
+    return [
+        st.st_size if _is_nonempty_file(st) else 0 for st in _stat_all(paths)
+    ]
+
+
+def _batch_file_lines(
+    bucket_name: str, downloads: Iterable[Tuple[str, str]]
+) -> Iterator[bytes]:
+    """Yield one s5cmd batch line per download: cp "s3://bucket/key" "/local/path"."""
+    # Quote both source and destination to handle spaces and special characters.
+    # The fixed parts are encoded once and each line is joined as bytes.
+    prefix = f'cp "s3://{bucket_name}/'.encode()
+    mid = b'" "'
+    tail = b'"\n'
+    for object_key, local_path in downloads:
+        yield b"".join(
+            (prefix, object_key.encode(), mid, os.fsencode(local_path), tail)
+        )
+
 
 class S5cmdDownloader:
     """S5cmd implementation using subprocess for comparison."""
@@ -44,6 +158,11 @@ class S5cmdDownloader:
             raise RuntimeError(
                 "s5cmd not found in PATH. Please install s5cmd first."
             )
+        self.env = {
+            name: value
+            for name, value in os.environ.items()
+            if name.startswith("AWS_") or name in S5CMD_ENV_NAMES
+        }
 
     def download_multiple_files_with_paths(
         self, bucket_name: str, downloads: List[Tuple[str, str]]
@@ -52,22 +171,18 @@ class S5cmdDownloader:
         successful = []
         failed = []
         all_target_paths = [local_path for _, local_path in downloads]
+        actual_files_count = None
 
-        # Create directories for all target paths
-        for _, local_path in downloads:
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        # Create each target directory once; they are usually all the same
+        for directory in {os.path.dirname(p) for _, p in downloads}:
+            os.makedirs(directory, exist_ok=True)
 
         # Create a temporary batch file for s5cmd
         with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".txt", delete=False
+            mode="wb", suffix=".txt", delete=False
         ) as batch_file:
             batch_filename = batch_file.name
-            for object_key, local_path in downloads:
-                # s5cmd batch command format: cp "s3://bucket/key" "/local/path"
-                # Quote both source and destination to handle spaces and special characters
-                batch_file.write(
-                    f'cp "s3://{bucket_name}/{object_key}" "{local_path}"\n'
-                )
+            batch_file.writelines(_batch_file_lines(bucket_name, downloads))
 
         try:
             # Run s5cmd with the batch file
@@ -80,34 +195,21 @@ class S5cmdDownloader:
                 batch_filename,
             ]
 
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300,  # 5 minute timeout
-            )
+            self._run(cmd)
 
             # Parse s5cmd output to determine success/failure
             # s5cmd can have partial successes even with non-zero return code
-            # Check which files actually exist and have content regardless of return code
-            for _, local_path in downloads:
-                if (
-                    os.path.isfile(local_path)
-                    and os.path.getsize(local_path) > 0
-                ):
+            # Check which files actually exist and have content regardless of return code,
+            # with one size lookup per file feeding both the lists and the count
+            actual_files_count = 0
+            sizes = _file_sizes(all_target_paths)
+            for local_path, size in zip(all_target_paths, sizes):
+                if size > 0:
                     successful.append(local_path)
+                    actual_files_count += 1
                 else:
                     failed.append(local_path)
 
-            # Log any errors for debugging
-            if result.returncode != 0 and result.stderr:
-                print(f"s5cmd stderr: {result.stderr.strip()}")
-            if result.stdout and "--json" in cmd:
-                # Parse JSON output for detailed error information if needed
-                for line in result.stdout.strip().split("\n"):
-                    if line.strip() and '"error"' in line:
-                        print(f"s5cmd error detail: {line.strip()}")
-
         except subprocess.TimeoutExpired:
             print("s5cmd timed out")
             failed = [local_path for _, local_path in downloads]
@@ -120,7 +222,9 @@ class S5cmdDownloader:
             except OSError:
                 pass
 
-        actual_files_count = self._count_existing_files(all_target_paths)
+        if actual_files_count is None:
+            # s5cmd did not finish, but it may still have written some files
+            actual_files_count = self._count_existing_files(all_target_paths)
         strict_success_rate = (
             actual_files_count / len(downloads) if downloads else 0
         )
@@ -136,134 +240,162 @@ class S5cmdDownloader:
             "actual_files_count": actual_files_count,
         }
 
+    def _run(self, cmd: List[str]) -> int:
+        """
+        Run s5cmd and return its exit status, printing only its error output.
+
+        stdout is read as raw bytes line by line and only lines carrying an
+        error are decoded, so a large --json log is never buffered in full.
+        stderr goes to a temporary file so neither pipe can fill up and stall
+        s5cmd. Raises subprocess.TimeoutExpired if it runs past S5CMD_TIMEOUT.
+        """
+        timed_out = threading.Event()
+        with (
+            tempfile.TemporaryFile() as stderr_file,
+            # A trimmed environment and no inherited descriptors keep the
+            # launch cheap. close_fds=True rules out posix_spawn, but without
+            # preexec_fn CPython 3.10+ still launches via vfork on Linux
+            # rather than a full fork.
+            subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
+                env=self.env,
+                close_fds=True,
+            ) as proc,
+        ):
+
+            def kill() -> None:
+                timed_out.set()
+                proc.kill()
+
+            # Killing s5cmd closes its stdout, which ends the read loop.
+            timer = threading.Timer(S5CMD_TIMEOUT, kill)
+            timer.start()
+            try:
+                for raw in proc.stdout:
+                    if b'"error"' in raw:
+                        line = raw.decode(errors="replace").strip()
+                        print(f"s5cmd error detail: {line}")
+                returncode = proc.wait()
+            finally:
+                timer.cancel()
+
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(cmd, S5CMD_TIMEOUT)
+            if returncode != 0:
+                stderr_file.seek(0)
+                stderr = stderr_file.read().decode(errors="replace").strip()
+                if stderr:
+                    print(f"s5cmd stderr: {stderr}")
+        return returncode
+
     def _count_existing_files(self, file_paths: List[str]) -> int:
         """Count how many files actually exist on disk with non-zero size."""
-        return sum(
-            1
-            for path in file_paths
-            if os.path.isfile(path) and os.path.getsize(path) > 0
-        )
+        return sum(1 for size in _file_sizes(file_paths) if size > 0)
 
 
-class PerformanceMetrics:
-    """Simple class to capture and display performance metrics."""
+def create_download_paths(
+    downloads: List[Tuple[str, str]], base_dir: str
+) -> List[Tuple[str, str]]:
+    """Create local file paths for downloads."""
+    return [
+        (object_key, os.path.join(base_dir, f"file_{i:03d}.jpg"))
+        for i, (bucket_name, object_key) in enumerate(downloads)
+    ]
 
-    def __init__(self, name: str):
-        self.name = name
-        self.start_time = None
-        self.end_time = None
-        self.duration = None
-        self.results = None
-        self.verification_data = None
 
-    def start(self):
-        self.start_time = time.time()
+def make_rust_downloader_factory() -> Callable[..., robinzhon.S3Downloader]:
+    """Return a max_workers -> S3Downloader factory that builds each downloader only once."""
+    cache = {}
 
-    def end(self, results):
-        self.end_time = time.time()
-        self.duration = self.end_time - self.start_time
-        self.results = results
+    def make(
+        max_workers: int, chunks_per_file: Optional[int] = None
+    ) -> robinzhon.S3Downloader:
+        key = (max_workers, chunks_per_file)
+        if key not in cache:
+            if chunks_per_file is None:
+                cache[key] = robinzhon.S3Downloader("us-east-1", max_workers)
+            else:
+                cache[key] = robinzhon.S3Downloader(
+                    "us-east-1", max_workers, chunks_per_file=chunks_per_file
+                )
+        return cache[key]
 
-    def set_verification_data(self, actual_count: int, strict_rate: float):
-        """Set verification data calculated outside of timing."""
-        self.verification_data = {
-            "actual_files_count": actual_count,
-            "strict_success_rate": strict_rate,
-        }
+    return make
 
-    def throughput(self) -> float:
-        """Files per second."""
-        if self.duration and self.results:
-            total_files = getattr(
-                self.results,
-                "total_count",
-                lambda: self.results.get("total", 0),
-            )()
-            return total_files / self.duration
-        return 0
-
-    def success_rate(self) -> float:
-        """Success rate as percentage."""
-        if hasattr(self.results, "success_rate"):
-            return self.results.success_rate() * 100
-        elif isinstance(self.results, dict):
-            return self.results.get("success_rate", 0) * 100
-        return 0
-
-    def strict_success_rate(self) -> float:
-        """Strict success rate as percentage (based on actual file counts)."""
-        if self.verification_data:
-            return self.verification_data["strict_success_rate"] * 100
-        elif (
-            isinstance(self.results, dict)
-            and "strict_success_rate" in self.results
-        ):
-            return self.results.get("strict_success_rate", 0) * 100
-        return self.success_rate()
-
-    def successful_count(self) -> int:
-        """Number of successful downloads."""
-        if hasattr(self.results, "successful"):
-            return len(self.results.successful)
-        elif isinstance(self.results, dict):
-            return len(self.results.get("successful", []))
-        return 0
-
-    def actual_files_count(self) -> int:
-        """Number of files that actually exist on disk."""
-        if self.verification_data:
-            return self.verification_data["actual_files_count"]
-        elif (
-            isinstance(self.results, dict)
-            and "actual_files_count" in self.results
-        ):
-            return self.results.get("actual_files_count", 0)
-        return self.successful_count()
 
+def supports_chunks_per_file() -> bool:
+    """Whether this robinzhon build's S3Downloader accepts chunks_per_file."""
+    try:
+        parameters = inspect.signature(robinzhon.S3Downloader).parameters
+    except (TypeError, ValueError):
+        return False
+    return "chunks_per_file" in parameters
 
-def load_test_data(csv_file: str, limit: int = 50) -> List[Tuple[str, str]]:
-    """Load test data from CSV file, limiting to first N entries for manageable testing."""
-    downloads = []
-    csv_path = Path(__file__).parent / csv_file
 
-    if not csv_path.exists():
-        return []
+def warm_up_rust(downloader, bucket_name: str, object_key: str) -> None:
+    """Fetch one object untimed into a scratch directory so the downloader has a live connection before timing."""
+    with tempfile.TemporaryDirectory(
+        prefix="robinzhon_warm_up_", dir=TMP_BASE_DIR
+    ) as warm_dir:
+        try:
+            downloader.download_multiple_files_with_paths(
+                bucket_name,
+                [(object_key, os.path.join(warm_dir, "warm_up.jpg"))],
+            )
+        except Exception as e:
+            print(f"robinzhon warm-up failed: {e}")
 
-    with open(csv_path, "r") as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader):
-            if i >= limit:
-                break
-            bucket_name = row["BUCKET_NAME"]
-            object_key = row["IMAGE_PATH"]
-            downloads.append((bucket_name, object_key))
 
-    return downloads
+@pytest.fixture(scope="session")
+def rust_downloader_factory():
+    """Shared S3Downloaders, so cases with equal max_workers reuse one connection pool."""
+    return make_rust_downloader_factory()
 
 
-def create_download_paths(
-    downloads: List[Tuple[str, str]], base_dir: str
-) -> List[Tuple[str, str]]:
-    """Create local file paths for downloads."""
-    return [
-        (object_key, os.path.join(base_dir, f"file_{i:03d}.jpg"))
-        for i, (bucket_name, object_key) in enumerate(downloads)
-    ]
+@pytest.fixture(scope="session")
+def warm_up(rust_downloader_factory):
+    """
+    Download one object with s5cmd and with robinzhon, untimed, once per session.
+
+    This takes the s5cmd binary lookup and first launch, DNS and credential
+    resolution out of the first measured case. Every SWEEP_CASES worker count
+    gets its shared robinzhon downloader from rust_downloader_factory warmed,
+    so the instances the cases time already hold a live connection.
+    """
+    test_data = load_test_data("objects_and_keys.csv", limit=1)
+    if not test_data:
+        return
+
+    bucket_name, object_key = test_data[0]
+    with tempfile.TemporaryDirectory(
+        prefix="warm_up_", dir=TMP_BASE_DIR
+    ) as warm_dir:
+        downloads = [(object_key, os.path.join(warm_dir, "warm_up.jpg"))]
+        try:
+            S5cmdDownloader().download_multiple_files_with_paths(
+                bucket_name, downloads
+            )
+        except Exception as e:
+            print(f"s5cmd warm-up failed: {e}")
+
+    for max_workers in sorted({w for _, w in SWEEP_CASES}):
+        try:
+            rust_downloader = rust_downloader_factory(max_workers)
+        except Exception as e:
+            print(f"robinzhon warm-up failed: {e}")
+            continue
+        warm_up_rust(rust_downloader, bucket_name, object_key)
 
 
 @pytest.mark.performance
-@pytest.mark.parametrize(
-    "file_count,max_workers",
-    [
-        (10, 8),
-        (50, 16),
-        (100, 20),
-        (200, 32),
-        (500, 40),
-        (1000, 50),
-    ],
-)
-def test_s5cmd_vs_robinzhon_performance(file_count, max_workers):
+@pytest.mark.slow
+@pytest.mark.usefixtures("warm_up")
+@pytest.mark.parametrize("file_count,max_workers", SWEEP_CASES)
+def test_s5cmd_vs_robinzhon_performance(
+    file_count, max_workers, rust_downloader_factory, parallel_bench
+):
     """
     Compare performance between s5cmd and robinzhon.
 
@@ -272,6 +404,10 @@ def test_s5cmd_vs_robinzhon_performance(file_count, max_workers):
     - robinzhon (Rust-based async implementation)
 
     Tests different file counts and worker counts to see how performance scales.
+    Deprecated in favour of test_sweep_inline, which runs the same matrix
+    without per-case setup; kept under the slow marker for detailed reports.
+    With --parallel-bench both run at once to shorten the suite; they then
+    share bandwidth, so use the default serial mode for fair numbers.
     """
     print(f"\n{'=' * 60}")
     print(
@@ -286,68 +422,102 @@ def test_s5cmd_vs_robinzhon_performance(file_count, max_workers):
     bucket_name = test_data[0][0]
 
     with (
-        tempfile.TemporaryDirectory(prefix="s5cmd_test_") as s5cmd_dir,
-        tempfile.TemporaryDirectory(prefix="robinzhon_test_") as rust_dir,
+        tempfile.TemporaryDirectory(
+            prefix="s5cmd_test_", dir=TMP_BASE_DIR
+        ) as s5cmd_dir,
+        tempfile.TemporaryDirectory(
+            prefix="robinzhon_test_", dir=TMP_BASE_DIR
+        ) as rust_dir,
     ):
         s5cmd_downloads = create_download_paths(test_data, s5cmd_dir)
         rust_downloads = create_download_paths(test_data, rust_dir)
 
-        # Test s5cmd first
-        print("\nTesting s5cmd implementation...")
-        s5cmd_metrics = PerformanceMetrics("s5cmd")
-        s5cmd_metrics.start()
-
         try:
             s5cmd_downloader = S5cmdDownloader(max_workers=max_workers)
-            s5cmd_results = s5cmd_downloader.download_multiple_files_with_paths(
-                bucket_name, s5cmd_downloads
-            )
-            s5cmd_metrics.end(s5cmd_results)
-            print(f"Completed in {s5cmd_metrics.duration:.2f}s")
         except Exception as e:
-            print(f"Failed: {e}")
             pytest.skip(f"s5cmd test failed: {e}")
+        try:
+            rust_downloader = rust_downloader_factory(max_workers)
+        except Exception as e:
+            pytest.skip(f"Failed to initialize robinzhon downloader: {e}")
 
-        # Test robinzhon
-        print("\nTesting robinzhon implementation...")
-        rust_metrics = PerformanceMetrics("robinzhon")
-        rust_metrics.start()
+        def run_s5cmd() -> PerformanceMetrics:
+            print("\nTesting s5cmd implementation...")
+            s5cmd_metrics = PerformanceMetrics("s5cmd")
+            s5cmd_metrics.start()
 
-        try:
-            rust_downloader = robinzhon.S3Downloader("us-east-1", max_workers)
-            rust_results = rust_downloader.download_multiple_files_with_paths(
-                bucket_name, rust_downloads
-            )
-            rust_metrics.end(rust_results)
-            print(f"Download completed in {rust_metrics.duration:.2f}s")
+            try:
+                s5cmd_results = (
+                    s5cmd_downloader.download_multiple_files_with_paths(
+                        bucket_name, s5cmd_downloads
+                    )
+                )
+                s5cmd_metrics.end(s5cmd_results)
+                print(f"Completed in {s5cmd_metrics.duration:.2f}s")
+            except Exception as e:
+                print(f"Failed: {e}")
+                pytest.skip(f"s5cmd test failed: {e}")
+            return s5cmd_metrics
+
+        def run_rust() -> PerformanceMetrics:
+            print("\nTesting robinzhon implementation...")
+            rust_metrics = PerformanceMetrics("robinzhon")
+            rust_metrics.start()
 
-            # Verify robinzhon downloads
-            print("Verifying robinzhon downloads...")
-            rust_target_paths = [local_path for _, local_path in rust_downloads]
-            rust_actual_count = s5cmd_downloader._count_existing_files(
-                rust_target_paths
-            )
+            try:
+                rust_results = (
+                    rust_downloader.download_multiple_files_with_paths(
+                        bucket_name, rust_downloads
+                    )
+                )
+                rust_metrics.end(rust_results)
+                print(f"Download completed in {rust_metrics.duration:.2f}s")
+
+                # Verify robinzhon downloads
+                print("Verifying robinzhon downloads...")
+                rust_target_paths = [
+                    local_path for _, local_path in rust_downloads
+                ]
+                rust_actual_count = s5cmd_downloader._count_existing_files(
+                    rust_target_paths
+                )
 
-            if hasattr(rust_results, "total_count"):
-                total = rust_results.total_count()
-            else:
-                total = len(rust_downloads)
-            rust_strict_rate = rust_actual_count / total if total else 0
-            rust_metrics.set_verification_data(
-                rust_actual_count, rust_strict_rate
-            )
+                if hasattr(rust_results, "total_count"):
+                    total = rust_results.total_count()
+                else:
+                    total = len(rust_downloads)
+                rust_strict_rate = rust_actual_count / total if total else 0
+                rust_metrics.set_verification_data(
+                    rust_actual_count, rust_strict_rate
+                )
 
-        except Exception as e:
-            print(f"Failed: {e}")
-            pytest.skip(f"robinzhon test failed: {e}")
+            except Exception as e:
+                print(f"Failed: {e}")
+                pytest.skip(f"robinzhon test failed: {e}")
+            return rust_metrics
+
+        if parallel_bench:
+            # Shorter suite, but both share the network, so the durations
+            # are not a fair head-to-head comparison.
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                s5cmd_future = executor.submit(run_s5cmd)
+                rust_future = executor.submit(run_rust)
+                s5cmd_metrics = s5cmd_future.result()
+                rust_metrics = rust_future.result()
+        else:
+            s5cmd_metrics = run_s5cmd()
+            rust_metrics = run_rust()
 
         # Display results
-        print(
+        lines = []
+        lines.append(
             f"\nPerformance Results ({file_count} files, {max_workers} workers)"
         )
-        print(f"{'=' * 75}")
-        print(f"{'Metric':<25} {'s5cmd':<15} {'robinzhon':<15} {'Winner'}")
-        print(f"{'=' * 75}")
+        lines.append(f"{'=' * 75}")
+        lines.append(
+            f"{'Metric':<25} {'s5cmd':<15} {'robinzhon':<15} {'Winner'}"
+        )
+        lines.append(f"{'=' * 75}")
 
         # Duration comparison
         durations = {
@@ -356,7 +526,7 @@ def test_s5cmd_vs_robinzhon_performance(file_count, max_workers):
         }
         duration_winner = min(durations, key=durations.get)
 
-        print(
+        lines.append(
             f"{'Duration (seconds)':<25} {s5cmd_metrics.duration:<15.2f} {rust_metrics.duration:<15.2f} {duration_winner}"
         )
 
@@ -369,7 +539,7 @@ def test_s5cmd_vs_robinzhon_performance(file_count, max_workers):
         }
         throughput_winner = max(throughputs, key=throughputs.get)
 
-        print(
+        lines.append(
             f"{'Throughput (files/sec)':<25} {s5cmd_throughput:<15.1f} {rust_throughput:<15.1f} {throughput_winner}"
         )
 
@@ -382,7 +552,7 @@ def test_s5cmd_vs_robinzhon_performance(file_count, max_workers):
         }
         success_winner = max(success_rates, key=success_rates.get)
 
-        print(
+        lines.append(
             f"{'Success Rate (%)':<25} {s5cmd_success:<15.1f} {rust_success:<15.1f} {success_winner}"
         )
 
@@ -390,32 +560,36 @@ def test_s5cmd_vs_robinzhon_performance(file_count, max_workers):
         s5cmd_files = s5cmd_metrics.successful_count()
         rust_files = rust_metrics.successful_count()
 
-        print(f"{'Files Downloaded':<25} {s5cmd_files:<15} {rust_files:<15}")
+        lines.append(
+            f"{'Files Downloaded':<25} {s5cmd_files:<15} {rust_files:<15}"
+        )
 
-        print(f"{'=' * 75}")
+        lines.append(f"{'=' * 75}")
 
         # Performance summary
-        print("\nPerformance Summary:")
+        lines.append("\nPerformance Summary:")
         if duration_winner == "robinzhon":
             speedup = s5cmd_metrics.duration / rust_metrics.duration
-            print(f"robinzhon is {speedup:.1f}x faster than s5cmd")
+            lines.append(f"robinzhon is {speedup:.1f}x faster than s5cmd")
         elif duration_winner == "s5cmd":
             speedup = rust_metrics.duration / s5cmd_metrics.duration
-            print(f"s5cmd is {speedup:.1f}x faster than robinzhon")
+            lines.append(f"s5cmd is {speedup:.1f}x faster than robinzhon")
         else:
-            print("Performance is comparable")
+            lines.append("Performance is comparable")
 
         if throughput_winner == "robinzhon":
             throughput_ratio = rust_throughput / s5cmd_throughput
-            print(
+            lines.append(
                 f"robinzhon has {throughput_ratio:.1f}x higher throughput than s5cmd"
             )
         elif throughput_winner == "s5cmd":
             throughput_ratio = s5cmd_throughput / rust_throughput
-            print(
+            lines.append(
                 f"s5cmd has {throughput_ratio:.1f}x higher throughput than robinzhon"
             )
 
+        print("\n".join(lines))
+
 
 @pytest.mark.performance
 @pytest.mark.parametrize(
@@ -425,7 +599,9 @@ def test_s5cmd_vs_robinzhon_performance(file_count, max_workers):
         (5, 16),
     ],
 )
-def test_s5cmd_vs_robinzhon_quick_check(file_count, max_workers):
+def test_s5cmd_vs_robinzhon_quick_check(
+    file_count, max_workers, rust_downloader_factory
+):
     """
     Quick performance check with just a few files for development/CI.
     Compares s5cmd against robinzhon implementation with different worker counts.
@@ -444,8 +620,12 @@ def test_s5cmd_vs_robinzhon_quick_check(file_count, max_workers):
     bucket_name = test_data[0][0]
 
     with (
-        tempfile.TemporaryDirectory(prefix="s5cmd_test_") as s5cmd_dir,
-        tempfile.TemporaryDirectory(prefix="robinzhon_test_") as rust_dir,
+        tempfile.TemporaryDirectory(
+            prefix="s5cmd_test_", dir=TMP_BASE_DIR
+        ) as s5cmd_dir,
+        tempfile.TemporaryDirectory(
+            prefix="robinzhon_test_", dir=TMP_BASE_DIR
+        ) as rust_dir,
     ):
         s5cmd_downloads = create_download_paths(test_data, s5cmd_dir)
         rust_downloads = create_download_paths(test_data, rust_dir)
@@ -469,7 +649,7 @@ def test_s5cmd_vs_robinzhon_quick_check(file_count, max_workers):
         # Test robinzhon
         print("\nInitializing robinzhon downloader...")
         try:
-            rust_downloader = robinzhon.S3Downloader("us-east-1", max_workers)
+            rust_downloader = rust_downloader_factory(max_workers)
         except Exception as e:
             print(f"Failed to initialize robinzhon downloader: {e}")
             return
@@ -489,12 +669,15 @@ def test_s5cmd_vs_robinzhon_quick_check(file_count, max_workers):
             return
 
         # Display results
-        print(
+        lines = []
+        lines.append(
             f"\nPerformance Results ({file_count} files, {max_workers} workers)"
         )
-        print(f"{'=' * 75}")
-        print(f"{'Metric':<25} {'s5cmd':<15} {'robinzhon':<15} {'Winner'}")
-        print(f"{'=' * 75}")
+        lines.append(f"{'=' * 75}")
+        lines.append(
+            f"{'Metric':<25} {'s5cmd':<15} {'robinzhon':<15} {'Winner'}"
+        )
+        lines.append(f"{'=' * 75}")
 
         durations = {
             "s5cmd": s5cmd_metrics.duration,
@@ -502,7 +685,7 @@ def test_s5cmd_vs_robinzhon_quick_check(file_count, max_workers):
         }
         duration_winner = min(durations, key=durations.get)
 
-        print(
+        lines.append(
             f"{'Duration (seconds)':<25} {s5cmd_metrics.duration:<15.2f} {rust_metrics.duration:<15.2f} {duration_winner}"
         )
 
@@ -514,7 +697,7 @@ def test_s5cmd_vs_robinzhon_quick_check(file_count, max_workers):
         }
         throughput_winner = max(throughputs, key=throughputs.get)
 
-        print(
+        lines.append(
             f"{'Throughput (files/sec)':<25} {s5cmd_throughput:<15.1f} {rust_throughput:<15.1f} {throughput_winner}"
         )
 
@@ -526,26 +709,294 @@ def test_s5cmd_vs_robinzhon_quick_check(file_count, max_workers):
         }
         success_winner = max(success_rates, key=success_rates.get)
 
-        print(
+        lines.append(
             f"{'Success Rate (%)':<25} {s5cmd_success:<15.1f} {rust_success:<15.1f} {success_winner}"
         )
 
         s5cmd_files = s5cmd_metrics.successful_count()
         rust_files = rust_metrics.successful_count()
 
-        print(f"{'Files Downloaded':<25} {s5cmd_files:<15} {rust_files:<15}")
+        lines.append(
+            f"{'Files Downloaded':<25} {s5cmd_files:<15} {rust_files:<15}"
+        )
 
-        print(f"{'=' * 75}")
+        lines.append(f"{'=' * 75}")
 
-        print("\nPerformance Summary:")
+        lines.append("\nPerformance Summary:")
         if duration_winner == "robinzhon":
             speedup = s5cmd_metrics.duration / rust_metrics.duration
-            print(f"robinzhon is {speedup:.1f}x faster than s5cmd")
+            lines.append(f"robinzhon is {speedup:.1f}x faster than s5cmd")
         elif duration_winner == "s5cmd":
             speedup = rust_metrics.duration / s5cmd_metrics.duration
-            print(f"s5cmd is {speedup:.1f}x faster than robinzhon")
+            lines.append(f"s5cmd is {speedup:.1f}x faster than robinzhon")
+        else:
+            lines.append("Performance is comparable")
+
+        print("\n".join(lines))
+
+
+@pytest.mark.performance
+def test_autotune_workers(rust_downloader_factory):
+    """
+    Find the robinzhon max_workers knee instead of relying on the fixed ladder.
+
+    Doubles max_workers from 4 to 64 over 200 files and stops once
+    throughput drops more than 5% below the previous step, reporting the
+    best worker count seen. Each downloader is warmed before it is timed,
+    and each step gets its own slice of keys when the CSV has enough rows
+    (otherwise the same keys in a fixed per-step shuffle), so later steps
+    do not benefit from objects earlier steps already fetched.
+    """
+    file_count = 200
+    ladder = [4, 8, 16, 32, 64]
+    print(f"\n{'=' * 60}")
+    print(f"robinzhon max_workers autotune: {file_count} files")
+    print(f"{'=' * 60}")
+
+    test_data = load_test_data(
+        "objects_and_keys.csv", limit=file_count * len(ladder)
+    )
+    if not test_data:
+        pytest.skip("No test data available")
+
+    bucket_name = test_data[0][0]
+    warm_key = test_data[-1][1]
+    best_workers = None
+    best_throughput = 0.0
+    previous_throughput = None
+
+    for step, max_workers in enumerate(ladder):
+        start = step * file_count
+        if start + file_count <= len(test_data):
+            step_data = test_data[start : start + file_count]
+        else:
+            step_data = test_data[:file_count]
+            random.Random(step).shuffle(step_data)
+
+        with tempfile.TemporaryDirectory(
+            prefix="robinzhon_tune_", dir=TMP_BASE_DIR
+        ) as rust_dir:
+            rust_downloads = create_download_paths(step_data, rust_dir)
+            metrics = PerformanceMetrics(f"robinzhon w={max_workers}")
+            try:
+                rust_downloader = rust_downloader_factory(max_workers)
+                warm_up_rust(rust_downloader, bucket_name, warm_key)
+                metrics.start()
+                rust_results = (
+                    rust_downloader.download_multiple_files_with_paths(
+                        bucket_name, rust_downloads
+                    )
+                )
+                metrics.end(rust_results)
+            except Exception as e:
+                pytest.skip(f"robinzhon test failed: {e}")
+
+        throughput = metrics.throughput()
+        print(f"{max_workers:>3} workers: {throughput:.1f} files/sec")
+        if throughput > best_throughput:
+            best_workers, best_throughput = max_workers, throughput
+        if (
+            previous_throughput is not None
+            and throughput < previous_throughput * 0.95
+        ):
+            break
+        previous_throughput = throughput
+
+    print(f"Best max_workers: {best_workers} ({best_throughput:.1f} files/sec)")
+
+
+@pytest.mark.performance
+@pytest.mark.usefixtures("warm_up")
+def test_sweep_inline(rust_downloader_factory):
+    """
+    Run the whole SWEEP_CASES matrix for s5cmd and robinzhon in one test.
+
+    Cases are grouped by max_workers so each group builds its downloaders
+    once and reuses robinzhon's connection pool across file counts, without
+    per-case fixture setup. One row per implementation and case is written
+    to SWEEP_CSV.
+    """
+    test_data = load_test_data(
+        "objects_and_keys.csv", limit=max(n for n, _ in SWEEP_CASES)
+    )
+    if not test_data:
+        pytest.skip("No test data available")
+
+    bucket_name = test_data[0][0]
+
+    groups: Dict[int, List[int]] = {}
+    for file_count, max_workers in SWEEP_CASES:
+        groups.setdefault(max_workers, []).append(file_count)
+
+    rows = []
+    for max_workers, file_counts in groups.items():
+        try:
+            s5cmd_downloader = S5cmdDownloader(max_workers=max_workers)
+            rust_downloader = rust_downloader_factory(max_workers)
+        except Exception as e:
+            pytest.skip(f"Failed to initialize downloaders: {e}")
+
+        for file_count in file_counts:
+            for name, downloader in (
+                ("s5cmd", s5cmd_downloader),
+                ("robinzhon", rust_downloader),
+            ):
+                with tempfile.TemporaryDirectory(
+                    prefix=f"{name}_sweep_", dir=TMP_BASE_DIR
+                ) as base_dir:
+                    downloads = create_download_paths(
+                        test_data[:file_count], base_dir
+                    )
+                    metrics = PerformanceMetrics(name)
+                    metrics.start()
+                    try:
+                        results = downloader.download_multiple_files_with_paths(
+                            bucket_name, downloads
+                        )
+                        metrics.end(results)
+                    except Exception as e:
+                        pytest.skip(f"{name} test failed: {e}")
+
+                print(
+                    f"{name:<10} {file_count:>5} files {max_workers:>3} workers: "
+                    f"{metrics.duration:.2f}s, {metrics.throughput():.1f} files/sec"
+                )
+                rows.append(
+                    [
+                        name,
+                        file_count,
+                        max_workers,
+                        f"{metrics.duration:.4f}",
+                        f"{metrics.throughput():.2f}",
+                        f"{metrics.success_rate():.1f}",
+                    ]
+                )
+
+    with open(SWEEP_CSV, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            [
+                "implementation",
+                "file_count",
+                "max_workers",
+                "duration",
+                "throughput",
+                "success_rate",
+            ]
+        )
+        writer.writerows(rows)
+
+
+def record_surface_point(
+    concurrency: int,
+    parallelism: int,
+    file_count: int,
+    metrics: PerformanceMetrics,
+) -> None:
+    """Append one throughput surface row to SURFACE_CSV, writing the header first if needed."""
+    new_file = not SURFACE_CSV.exists()
+    with open(SURFACE_CSV, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(
+                [
+                    "concurrency",
+                    "parallelism",
+                    "file_count",
+                    "duration",
+                    "throughput",
+                ]
+            )
+        writer.writerow(
+            [
+                concurrency,
+                parallelism,
+                file_count,
+                f"{metrics.duration:.4f}",
+                f"{metrics.throughput():.2f}",
+            ]
+        )
+
+
+@pytest.mark.performance
+@pytest.mark.parametrize(
+    "concurrency,parallelism",
+    [(8, 1), (8, 4), (32, 1), (32, 4), (64, 2)],
+)
+def test_concurrency_parallelism_surface(
+    concurrency, parallelism, rust_downloader_factory
+):
+    """
+    Measure robinzhon across files in flight and byte-range streams per file.
+
+    Concurrency maps to max_concurrent_downloads and parallelism to a
+    chunks_per_file option. Cases with parallelism above 1 are skipped while
+    S3Downloader's signature has no chunks_per_file. Each cell's downloader
+    is warmed before timing, and each case appends its throughput to
+    SURFACE_CSV.
+    """
+    if parallelism > 1 and not supports_chunks_per_file():
+        pytest.skip("robinzhon.S3Downloader has no chunks_per_file option")
+
+    file_count = 100
+    test_data = load_test_data("objects_and_keys.csv", limit=file_count + 1)
+    if not test_data:
+        pytest.skip("No test data available")
+
+    bucket_name = test_data[0][0]
+    # Warm with the row past the timed ones when there is one.
+    warm_key = test_data[-1][1]
+    test_data = test_data[:file_count]
+
+    try:
+        if parallelism == 1:
+            rust_downloader = rust_downloader_factory(concurrency)
         else:
-            print("Performance is comparable")
+            rust_downloader = rust_downloader_factory(
+                concurrency, chunks_per_file=parallelism
+            )
+    except Exception as e:
+        pytest.skip(f"Failed to initialize robinzhon downloader: {e}")
+    warm_up_rust(rust_downloader, bucket_name, warm_key)
+
+    with tempfile.TemporaryDirectory(
+        prefix="robinzhon_surface_", dir=TMP_BASE_DIR
+    ) as rust_dir:
+        rust_downloads = create_download_paths(test_data, rust_dir)
+        metrics = PerformanceMetrics("robinzhon")
+        metrics.start()
+        try:
+            rust_results = rust_downloader.download_multiple_files_with_paths(
+                bucket_name, rust_downloads
+            )
+            metrics.end(rust_results)
+        except Exception as e:
+            pytest.skip(f"robinzhon test failed: {e}")
+
+    print(
+        f"\nconcurrency={concurrency} parallelism={parallelism}: "
+        f"{metrics.throughput():.1f} files/sec"
+    )
+    record_surface_point(concurrency, parallelism, len(test_data), metrics)
+
+
+def test_batch_file_lines():
+    """Test that each download becomes one quoted, UTF-8 encoded s5cmd cp line."""
+
+    lines = list(
+        _batch_file_lines(
+            "test-bucket",
+            [
+                ("photos/a b.jpg", "/tmp/out dir/file_000.jpg"),
+                ("fotos/año.jpg", "/tmp/file_001.jpg"),
+            ],
+        )
+    )
+
+    assert lines == [
+        b'cp "s3://test-bucket/photos/a b.jpg" "/tmp/out dir/file_000.jpg"\n',
+        'cp "s3://test-bucket/fotos/año.jpg" "/tmp/file_001.jpg"\n'.encode(),
+    ]
 
 
 def run_custom_benchmark(file_count: int = 5, max_workers: int = 8):
@@ -557,7 +1008,9 @@ def run_custom_benchmark(file_count: int = 5, max_workers: int = 8):
         max_workers: Number of workers to use
     """
     test_s5cmd_vs_robinzhon_quick_check(
-        file_count=file_count, max_workers=max_workers
+        file_count=file_count,
+        max_workers=max_workers,
+        rust_downloader_factory=make_rust_downloader_factory(),
     )
 
 
@@ -574,5 +1027,8 @@ if __name__ == "__main__":
         run_custom_benchmark(file_count=file_count, max_workers=max_workers)
     else:
         print("Running default quick benchmark: 5 files, 8 workers")
-        print("Usage: python test_vs_s5cmd.py <file_count> <max_workers>")
+        print(
+            "Usage: python tests/performance/test_vs_s5cmd.py"
+            " <file_count> <max_workers>"
+        )
         run_custom_benchmark()